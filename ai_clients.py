@@ -0,0 +1,204 @@
+import os
+import sys
+import json
+import asyncio
+import random
+import functools
+import importlib.util
+
+# Process-wide clients, created on first use and shared by every caller. Both
+# providers use the same httpx pool, so keep-alive connections (and their TLS
+# sessions) are reused across requests
+_http_client = None
+_async_openai_client = None
+_async_anthropic_client = None
+
+
+# Use orjson for batch JSONL when available; it emits UTF-8 bytes directly
+try:
+    import orjson
+
+    json_dumps = orjson.dumps
+    json_loads = orjson.loads
+except ImportError:
+    def json_dumps(obj):
+        """Serialize obj to compact UTF-8 JSON bytes"""
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    json_loads = json.loads
+
+
+def _use_orjson_request_bodies(base_client_module):
+    """Encode an SDK's request bodies with orjson instead of its json.JSONEncoder subclass"""
+    try:
+        import orjson
+    except ImportError:
+        return
+    sdk_dumps = getattr(base_client_module, 'openapi_dumps', None)
+    if sdk_dumps is None or getattr(sdk_dumps, '_orjson', False):
+        return
+
+    def dumps(obj):
+        try:
+            # Same output as the SDK encoder: compact separators, UTF-8, no ASCII escaping
+            return orjson.dumps(obj)
+        except TypeError:
+            # Types orjson does not know (e.g. pydantic models) go through the SDK encoder
+            return sdk_dumps(obj)
+
+    dumps._orjson = True
+    base_client_module.openapi_dumps = dumps
+
+
+def get_http_client():
+    """Return the shared httpx.AsyncClient, creating it on first use"""
+    global _http_client
+    if _http_client is None:
+        import httpx
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=256,
+                max_keepalive_connections=256,
+                keepalive_expiry=30
+            ),
+            # Multiplex requests over fewer connections when the h2 package is installed
+            http2=importlib.util.find_spec('h2') is not None
+        )
+    return _http_client
+
+
+def get_async_openai_client():
+    """Return the shared AsyncOpenAI client, creating it on first use"""
+    global _async_openai_client
+    if _async_openai_client is None:
+        import openai
+        import openai._base_client
+        _use_orjson_request_bodies(openai._base_client)
+        _async_openai_client = openai.AsyncOpenAI(
+            api_key=os.getenv('OPENAI_API_KEY'),
+            timeout=60,
+            max_retries=0,  # Retries are handled by the callers
+            http_client=get_http_client()
+        )
+    return _async_openai_client
+
+
+def get_async_anthropic_client():
+    """Return the shared AsyncAnthropic client, creating it on first use"""
+    global _async_anthropic_client
+    if _async_anthropic_client is None:
+        import anthropic
+        import anthropic._base_client
+        _use_orjson_request_bodies(anthropic._base_client)
+        _async_anthropic_client = anthropic.AsyncAnthropic(
+            api_key=os.getenv('CLAUDE_API_KEY'),
+            timeout=60,
+            max_retries=0,  # Retries are handled by the callers
+            http_client=get_http_client()
+        )
+    return _async_anthropic_client
+
+
+async def aclose():
+    """Close the shared connection pool; clients are re-created on next use"""
+    global _http_client, _async_openai_client, _async_anthropic_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _http_client = None
+    _async_openai_client = None
+    _async_anthropic_client = None
+
+
+async def share_inflight(inflight, key, start):
+    """
+    Await the request for key, sharing one task between concurrent identical requests.
+    
+    start() is called for a new request only when none is in flight under key. The
+    shared task is cancelled only when every caller awaiting it is, and is then
+    forgotten at once, so a caller arriving later starts a new request instead of
+    joining the cancelled one.
+    """
+    entry = inflight.get(key)
+    if entry is None:
+        task = asyncio.ensure_future(start())
+        entry = inflight[key] = [task, 0]
+
+        def forget(task):
+            # A cancelled request may have been replaced by now; only remove its own entry
+            if inflight.get(key, (None,))[0] is task:
+                del inflight[key]
+
+        task.add_done_callback(forget)
+
+    task = entry[0]
+    entry[1] += 1
+    try:
+        return await asyncio.shield(task)
+    finally:
+        entry[1] -= 1
+        if not entry[1] and not task.done():
+            del inflight[key]
+            task.cancel()
+
+
+def is_api_error(error, name='APIError'):
+    """Whether error is an instance of the named exception class of a provider SDK that is already loaded"""
+    for sdk in map(sys.modules.get, ('openai', 'anthropic')):
+        if sdk is not None and isinstance(error, getattr(sdk, name)):
+            return True
+    return False
+
+
+def is_retryable(error):
+    """Whether an API error is transient: rate limits, connection failures, timeouts and 5xx"""
+    # Only SDKs that are already loaded can have raised the error, so a
+    # single-provider run never imports the other one
+    for name in ('openai', 'anthropic'):
+        sdk = sys.modules.get(name)
+        if sdk is None:
+            continue
+        if isinstance(error, sdk.APIConnectionError):
+            return True
+        if isinstance(error, sdk.APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+    return False
+
+
+def retry_delay(error, attempt, max_delay=30):
+    """Seconds to wait before retry `attempt`: the server's Retry-After if sent, else jittered exponential backoff"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    for header, scale in (('retry-after-ms', 1000), ('retry-after', 1)):
+        try:
+            return min(float(headers[header]) / scale, 60)
+        except (KeyError, ValueError):
+            # Missing, or an HTTP date instead of seconds
+            continue
+    return random.uniform(1, min(max_delay, 2 ** attempt))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model):
+    """Return the tiktoken encoding for a model, or None if tiktoken is not installed"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        # Non-OpenAI models: cl100k_base is a close enough approximation
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def count_tokens(text, model):
+    """Count the tokens of text for a model, estimating ~3 chars per token without tiktoken"""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return len(text) // 3
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@functools.lru_cache(maxsize=32)
+def count_prompt_tokens(prompt, model):
+    """Count the tokens of a prompt that is reused across requests, tokenizing it only once"""
+    return count_tokens(prompt, model)
@@ -0,0 +1,58 @@
+import time
+import asyncio
+
+
+class RateLimiter:
+    """
+    Token-bucket limiter for requests per minute (RPM) and tokens per minute (TPM).
+
+    Both buckets start full and refill continuously at their per-minute rate.
+    `acquire()` waits until both buckets can cover the request, then consumes
+    from them. Waiters are served in arrival order. A limit of 0 disables the
+    corresponding bucket.
+    """
+
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = float(requests_per_minute)
+        self._available_tokens = float(tokens_per_minute)
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed_minutes = (now - self._updated_at) / 60
+        self._updated_at = now
+        self._available_requests = min(
+            self.requests_per_minute,
+            self._available_requests + elapsed_minutes * self.requests_per_minute
+        )
+        self._available_tokens = min(
+            self.tokens_per_minute,
+            self._available_tokens + elapsed_minutes * self.tokens_per_minute
+        )
+
+    async def acquire(self, tokens=0):
+        """Wait until one request using `tokens` tokens fits within both limits"""
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return
+
+        # A request larger than the whole bucket proceeds once the bucket is full
+        tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                wait_minutes = 0.0
+                if self.requests_per_minute and self._available_requests < 1:
+                    wait_minutes = (1 - self._available_requests) / self.requests_per_minute
+                if self.tokens_per_minute and self._available_tokens < tokens:
+                    wait_minutes = max(wait_minutes, (tokens - self._available_tokens) / self.tokens_per_minute)
+                if wait_minutes <= 0:
+                    break
+                await asyncio.sleep(wait_minutes * 60)
+
+            if self.requests_per_minute:
+                self._available_requests -= 1
+            if self.tokens_per_minute:
+                self._available_tokens -= tokens
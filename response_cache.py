@@ -0,0 +1,160 @@
+import os
+import math
+import sqlite3
+import hashlib
+import operator
+import tempfile
+import threading
+from array import array
+
+
+class ResponseCache:
+    """
+    Exact-match, content-addressed cache for model responses.
+
+    Each entry is stored as `{directory}/{sha256}.txt`, where the hash covers every
+    input that determines the response (provider, model, prompt, ...). Entries are
+    written to a temporary file and atomically renamed into place, so concurrent
+    processes sharing the directory never read a partially written entry.
+
+    With `max_entries` set, reads refresh an entry's modification time and the least
+    recently used entries are evicted down to 90% of the limit once it is exceeded.
+    """
+
+    def __init__(self, directory, max_entries=0):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+        self._count = len(self._entries()) if max_entries else 0
+
+    def _entries(self):
+        with os.scandir(self.directory) as it:
+            return [entry for entry in it if entry.name.endswith('.txt')]
+
+    @staticmethod
+    def make_key(*parts):
+        """Build a cache key from the strings that determine a response"""
+        return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss"""
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                value = f.read()
+        except FileNotFoundError:
+            return None
+        if self.max_entries:
+            try:
+                os.utime(self._path(key))
+            except FileNotFoundError:
+                pass  # Evicted by another process in the meantime
+        return value
+
+    def set(self, key, value):
+        """Store a response under key"""
+        is_new = self.max_entries and not os.path.exists(self._path(key))
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if is_new:
+            self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Remove the least recently used entries down to 90% of max_entries"""
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        excess = len(entries) - int(self.max_entries * 0.9)
+        for entry in entries[:max(excess, 0)]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        self._count = len(entries) - max(excess, 0)
+
+
+class SemanticCache:
+    """
+    Similarity cache for model responses, backed by SQLite.
+
+    Stores the embedding of every converted input next to its response. A lookup
+    returns the stored response of the most similar input in the same namespace
+    when their cosine similarity reaches the threshold and their lengths differ by
+    at most `length_tolerance`. Entries are kept in memory for scanning; the
+    database only persists them across runs.
+
+    Lookups and additions are safe to run in worker threads, so callers can keep
+    the scan off the event loop. New entries are committed every `commit_every`
+    additions and on `flush()`.
+    """
+
+    def __init__(self, path, threshold, length_tolerance=0.05, commit_every=100):
+        self.threshold = threshold
+        self.length_tolerance = length_tolerance
+        self.commit_every = commit_every
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(namespace TEXT, length INTEGER, embedding BLOB, response TEXT)"
+        )
+        self._entries = {}
+        for namespace, length, blob, response in self._db.execute(
+            "SELECT namespace, length, embedding, response FROM entries"
+        ):
+            vector = array('f')
+            vector.frombytes(blob)
+            self._entries.setdefault(namespace, []).append((vector, length, response))
+
+    @staticmethod
+    def _normalize(embedding):
+        norm = math.sqrt(sum(x * x for x in embedding)) or 1.0
+        return array('f', (x / norm for x in embedding))
+
+    def lookup(self, namespace, embedding, length):
+        """Return the response cached for the most similar input, or None"""
+        query = self._normalize(embedding)
+        with self._lock:
+            entries = self._entries.get(namespace, [])[:]
+        best_score, best_response = -1.0, None
+        for vector, cached_length, response in entries:
+            if abs(cached_length - length) > self.length_tolerance * max(cached_length, length):
+                continue
+            score = sum(map(operator.mul, query, vector))
+            if score > best_score:
+                best_score, best_response = score, response
+        return best_response if best_score >= self.threshold else None
+
+    def add(self, namespace, embedding, length, response):
+        """Store a response together with the embedding of its input"""
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._entries.setdefault(namespace, []).append((vector, length, response))
+            self._db.execute(
+                "INSERT INTO entries (namespace, length, embedding, response) VALUES (?, ?, ?, ?)",
+                (namespace, length, vector.tobytes(), response)
+            )
+            self._pending += 1
+            if self._pending >= self.commit_every:
+                self._commit()
+
+    def flush(self):
+        """Commit the entries added since the last commit"""
+        with self._lock:
+            self._commit()
+
+    def _commit(self):
+        if self._pending:
+            self._db.commit()
+            self._pending = 0
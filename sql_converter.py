@@ -1,15 +1,67 @@
+import io
 import os
+import re
 import glob
+import sys
 import time
+import queue
+import logging
+import logging.handlers
+import hashlib
+import itertools
 import asyncio
+import tempfile
+import collections
 import platform
 from dotenv import load_dotenv
 
+import ai_clients
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache, SemanticCache
+
 # Initialize colorama for Windows color support
 if platform.system() == 'Windows':
     from colorama import init
     init()
 
+# Per-chunk progress is logged rather than printed so that, once main() routes it
+# through a queue, completions never block the event loop on terminal output
+log = logging.getLogger(__name__)
+
+# Built-in prompt template, used when prompts/optimized_prompt.txt does not exist
+_DEFAULT_PROMPT_TEMPLATE = """You are a SQL conversion expert. Convert the provided SQL code from {source_type} to {target_type}, maintaining the same functionality while following best practices for the target database system. Preserve comments and formatting where possible."""
+
+# Fixed instructions appended to every system prompt. Together with the prompt
+# template they form a prefix that is byte-identical for every chunk of a run,
+# so providers can serve it from their prompt cache; only the SQL varies.
+_CONVERSION_DIRECTIVES = """Conversion rules:
+- Output only the converted SQL for the target database, without explanations or markdown code fences.
+- Preserve comments, object names and the original statement order.
+- Translate data types, built-in functions, procedural syntax, transaction and error handling to their target equivalents.
+- When a construct has no direct equivalent, emulate it and add a short SQL comment describing the change.
+- Do not add objects, statements or test data that are not present in the source."""
+
+# Upper bound on generated tokens per chunk; requests are sized below it from the input
+_MAX_OUTPUT_TOKENS = 4000
+
+# Constant lead-in of every user message; the SQL chunk always comes last
+_USER_PREFIX = "Convert the following SQL. Output only converted SQL, no code fences.\n---\n"
+
+# Batch separator: GO alone on its own line, in any case. Horizontal whitespace
+# only, so a match never spans lines; \r covers CRLF files. String literals and
+# comments are matched as whole tokens first, so a GO line inside them is skipped;
+# only matches of the 'go' group are separators
+_GO_RE = re.compile(r"""(?im)'[^']*'|"[^"]*"|--[^\n]*|/\*[\s\S]*?\*/|(?P<go>^[ \t]*go[ \t]*\r?$)""")
+
+# Start of a stored procedure, used to split batches that exceed the chunk size
+_PROC_RE = re.compile(r"(?im)^[ \t]*create\s+proc(?:edure)?\b")
+
+# Blank line, the preferred cut inside a procedure that exceeds the chunk size
+_BLANK_LINE_RE = re.compile(r"\n[ \t]*\r?\n")
+
+# Database types the converter accepts as source or target (compared case-insensitively)
+_VALID_DB_TYPES = frozenset({'SYBASE', 'MYSQL', 'POSTGRESQL', 'ORACLE', 'SQLSERVER', 'DB2'})
+
 class SQLConverter:
     def __init__(self, source_db_type=None, target_db_type=None, provider=None):
         """Initialize the SQL converter with optional configuration"""
@@ -20,19 +72,33 @@ class SQLConverter:
         self.clients = {}
         self.openai_model = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
         self.claude_model = os.getenv('CLAUDE_MODEL', 'claude-3-haiku-20240307')
+        # Conversions are deterministic so repeated chunks produce (and cache) the same output
+        self.openai_seed = int(os.getenv('OPENAI_SEED', '7'))
         
         # Setup AI providers
         if os.getenv('OPENAI_ENABLED', 'true').lower() == 'true':
-            import openai
-            openai.api_key = os.getenv('OPENAI_API_KEY')
-            self.clients['openai'] = openai.OpenAI()
+            self.clients['openai'] = ai_clients.get_async_openai_client()
             
         if os.getenv('CLAUDE_ENABLED', 'true').lower() == 'true':
-            import anthropic
-            self.clients['claude'] = anthropic.Anthropic(
-                api_key=os.getenv('CLAUDE_API_KEY')
+            self.clients['claude'] = ai_clients.get_async_anthropic_client()
+        
+        # Cap the number of in-flight requests per provider and keep within each account's rate limits
+        self.max_concurrency = {}
+        self.semaphores = {}
+        self.rate_limiters = {}
+        for name in ('openai', 'claude'):
+            prefix = name.upper()
+            self.max_concurrency[name] = int(os.getenv(f'{prefix}_MAX_CONCURRENCY', '20'))
+            self.semaphores[name] = asyncio.Semaphore(self.max_concurrency[name])
+            self.rate_limiters[name] = RateLimiter(
+                int(os.getenv(f'{prefix}_MAX_REQUESTS_PER_MINUTE', '0')),
+                int(os.getenv(f'{prefix}_MAX_TOKENS_PER_MINUTE', '0'))
             )
         
+        # Retry transient API failures (429, 5xx, connection errors) after the server's Retry-After
+        # or a randomized exponential backoff
+        self.max_attempts = int(os.getenv('MAX_RETRY_ATTEMPTS', '6'))
+        
         # Set default provider
         self.default_provider = provider or os.getenv('DEFAULT_AI_PROVIDER', 'openai')
         if self.default_provider not in self.clients:
@@ -43,9 +109,19 @@ class SQLConverter:
             else:
                 raise ValueError("No AI providers are properly configured.")
         
+        # Optionally send every chunk to all providers and keep the first answer
+        if os.getenv('RACE_PROVIDERS', 'false').lower() == 'true':
+            if len(self.clients) > 1:
+                self.default_provider = 'race'
+            else:
+                print("Warning: RACE_PROVIDERS needs both OpenAI and Claude enabled; racing is disabled.")
+        
         # Set database types
-        self.source_db_type = source_db_type or os.getenv('SOURCE_DB_TYPE', 'SYBASE')
-        self.target_db_type = target_db_type or os.getenv('TARGET_DB_TYPE', 'POSTGRESQL')
+        self.source_db_type = self._validate_db_type(source_db_type or os.getenv('SOURCE_DB_TYPE', 'SYBASE'))
+        self.target_db_type = self._validate_db_type(target_db_type or os.getenv('TARGET_DB_TYPE', 'POSTGRESQL'))
+        
+        # Token budget per chunk; small batches are packed up to it, larger ones split
+        self.max_chunk_tokens = int(os.getenv('MAX_CHUNK_TOKENS', '2000'))
         
         # Set file paths
         self.source_path = os.getenv('SOURCE_DB_CODE_FILE', './sql_files/*.sql')
@@ -53,188 +129,752 @@ class SQLConverter:
         
         # Create prompts directory if it doesn't exist
         os.makedirs('prompts', exist_ok=True)
+        self._prompt_template = None
+        self._prompt_mtime = None
+        self._system_prompts = {}
+        
+        # Chunk conversions in flight, shared by concurrent requests for the same chunk
+        self._inflight = {}
+        
+        # Exact-match cache of converted chunks, shared across runs
+        self.response_cache = None
+        if os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true':
+            self.response_cache = ResponseCache(
+                os.getenv('RESPONSE_CACHE_DIR', os.path.join('prompts', '_cache')),
+                int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '0'))
+            )
+        
+        # Optional similarity cache on top of the exact-match cache (needs OpenAI embeddings)
+        self.semantic_cache = None
+        semcache_threshold = os.getenv('SEMCACHE_THRESHOLD')
+        if semcache_threshold and 'openai' in self.clients:
+            self.embedding_model = os.getenv('SEMCACHE_EMBEDDING_MODEL', 'text-embedding-3-small')
+            self.semantic_cache = SemanticCache(
+                os.path.join('prompts', '_semcache', 'meta.sqlite'),
+                float(semcache_threshold)
+            )
 
-    async def _convert_chunk_openai(self, chunk, system_prompt=None, chunk_index=None):
-        """Convert a chunk of SQL using OpenAI"""
-        try:
-            start_time = time.perf_counter()
-            print(f"\n🔄 Processing chunk {chunk_index + 1}...")
-            
-            response = await asyncio.to_thread(
-                self.clients['openai'].chat.completions.create,
+    async def _request_with_retry(self, request, chunk_index):
+        """Await request(), retrying transient API errors with exponential backoff"""
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return await request()
+            except Exception as e:
+                if attempt == self.max_attempts or not ai_clients.is_retryable(e):
+                    raise
+                delay = ai_clients.retry_delay(e, attempt)
+                log.warning(f"⚠️  Chunk {chunk_index + 1}: {type(e).__name__} on attempt {attempt}, retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def _guarded(self, provider, tokens, request):
+        """Await request() within the provider's concurrency cap and rate limits"""
+        async with self.semaphores[provider]:
+            await self.rate_limiters[provider].acquire(tokens)
+            return await request()
+
+    async def _convert_chunk_openai(self, chunk, system_prompt, chunk_index, max_tokens, input_tokens):
+        """Request the conversion of a chunk of SQL from OpenAI; returns (text, truncated)"""
+        async def request():
+            stream = await self.clients['openai'].chat.completions.create(
                 model=self.openai_model,
-                temperature=0.7,
+                temperature=0,
+                seed=self.openai_seed,
+                max_tokens=max_tokens,
                 messages=[
                     {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": chunk}
-                ]
+                    {"role": "user", "content": _USER_PREFIX + chunk}
+                ],
+                stream=True
             )
-            
-            elapsed_time = (time.perf_counter() - start_time) * 1000  # Convert to milliseconds
-            if not response or not response.choices:
-                print(f"❌ Chunk {chunk_index + 1}: OpenAI returned empty response (took {elapsed_time:.2f}ms)")
-                return None
-                
-            result = response.choices[0].message.content.strip()
-            print(f"✅ Chunk {chunk_index + 1} completed in {elapsed_time:.2f}ms")
-            print(f"   • Size: {len(chunk):,} → {len(result):,} chars ({(len(result)-len(chunk))/len(chunk)*100:+.1f}%)")
-            return result
-        except Exception as e:
-            elapsed_time = (time.perf_counter() - start_time) * 1000
-            print(f"❌ Chunk {chunk_index + 1} failed after {elapsed_time:.2f}ms: {str(e)}")
-            return None
+            # Consume the stream while holding the slot so the connection is released promptly
+            parts = []
+            finish_reason = None
+            async for event in stream:
+                if event.choices:
+                    if event.choices[0].delta.content:
+                        parts.append(event.choices[0].delta.content)
+                    finish_reason = event.choices[0].finish_reason or finish_reason
+            return ''.join(parts), finish_reason == 'length'
+        
+        tokens = input_tokens + max_tokens
+        return await self._request_with_retry(lambda: self._guarded('openai', tokens, request), chunk_index)
 
-    async def _convert_chunk_claude(self, chunk, system_prompt=None, chunk_index=None):
-        """Convert a chunk of SQL using Claude"""
-        try:
-            start_time = time.perf_counter()
-            print(f"\n🔄 Processing chunk {chunk_index + 1}...")
-            
-            message = await asyncio.to_thread(
-                self.clients['claude'].messages.create,
+    async def _convert_chunk_claude(self, chunk, system_prompt, chunk_index, max_tokens, input_tokens):
+        """Request the conversion of a chunk of SQL from Claude; returns (text, truncated)"""
+        async def request():
+            stream = await self.clients['claude'].messages.create(
                 model=self.claude_model,
-                max_tokens=4000,
-                temperature=0.7,
-                system=system_prompt,
-                messages=[{"role": "user", "content": chunk}]
+                max_tokens=max_tokens,
+                temperature=0,
+                system=self._claude_system(system_prompt),
+                messages=[{"role": "user", "content": _USER_PREFIX + chunk}],
+                stream=True
             )
+            # Consume the stream while holding the slot so the connection is released promptly
+            parts = []
+            stop_reason = None
+            async for event in stream:
+                if event.type == 'content_block_delta' and event.delta.type == 'text_delta':
+                    parts.append(event.delta.text)
+                elif event.type == 'message_delta':
+                    stop_reason = event.delta.stop_reason
+            return ''.join(parts), stop_reason == 'max_tokens'
+        
+        tokens = input_tokens + max_tokens
+        return await self._request_with_retry(lambda: self._guarded('claude', tokens, request), chunk_index)
+
+    async def _convert_chunk_race(self, chunk, system_prompt, chunk_index, max_tokens, input_tokens):
+        """Send a chunk to every provider and return the first successful (text, truncated) response"""
+        tasks = [
+            asyncio.ensure_future(self._convert_chunk_openai(chunk, system_prompt, chunk_index, max_tokens, input_tokens)),
+            asyncio.ensure_future(self._convert_chunk_claude(chunk, system_prompt, chunk_index, max_tokens, input_tokens))
+        ]
+        error = None
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    content, truncated = await next_done
+                except Exception as e:
+                    # Fall back to the slower provider
+                    error = e
+                    continue
+                if content and content.strip():
+                    return content, truncated
+            if error:
+                raise error
+            return None, False
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _claude_system(system_prompt):
+        """System blocks for Claude, marking the shared system prompt for prompt caching"""
+        return [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+
+    @staticmethod
+    def _max_output_tokens(chunk_tokens):
+        """Size the output budget from the input; converted SQL rarely exceeds 1.3x its source"""
+        return min(_MAX_OUTPUT_TOKENS, int(chunk_tokens * 1.4) + 64)
+
+    async def _request_chunk(self, provider, chunk, system_prompt, chunk_index):
+        """Convert a chunk of SQL with the given provider, logging timing and size"""
+        # Per-chunk timing is only taken when it will be logged
+        verbose = log.isEnabledFor(logging.INFO)
+        start_time = time.perf_counter() if verbose else 0.0
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"🔄 Processing chunk {chunk_index + 1}...")
+        try:
+            request = {
+                'openai': self._convert_chunk_openai,
+                'claude': self._convert_chunk_claude,
+                'race': self._convert_chunk_race
+            }[provider]
+            # Tokenize the chunk once; the system prompt's count is shared by every chunk
+            model = self._get_model_name(provider)
+            chunk_tokens = ai_clients.count_tokens(chunk, model)
+            input_tokens = ai_clients.count_prompt_tokens(system_prompt, model) + chunk_tokens
+            max_tokens = self._max_output_tokens(chunk_tokens)
+            content, truncated = await request(chunk, system_prompt, chunk_index, max_tokens, input_tokens)
+            if truncated and max_tokens < _MAX_OUTPUT_TOKENS:
+                # The sized budget cut the SQL short; retry once with the full budget
+                log.warning(f"⚠️  Chunk {chunk_index + 1}: output hit {max_tokens:,} tokens, retrying with {_MAX_OUTPUT_TOKENS:,}")
+                content, truncated = await request(chunk, system_prompt, chunk_index, _MAX_OUTPUT_TOKENS, input_tokens)
+            if truncated:
+                # Cut-off SQL must neither be written nor cached
+                raise ValueError(f"{provider} output was truncated at {_MAX_OUTPUT_TOKENS:,} tokens; split the chunk with a lower MAX_CHUNK_TOKENS")
+            
+            if not content or not content.strip():
+                raise ValueError(f"{provider} returned empty response")
             
-            elapsed_time = (time.perf_counter() - start_time) * 1000  # Convert to milliseconds
-            if not message or not message.content:
-                print(f"❌ Chunk {chunk_index + 1}: Claude returned empty response (took {elapsed_time:.2f}ms)")
-                return None
-                
-            result = message.content[0].text.strip()
-            print(f"✅ Chunk {chunk_index + 1} completed in {elapsed_time:.2f}ms")
-            print(f"   • Size: {len(chunk):,} → {len(result):,} chars ({(len(result)-len(chunk))/len(chunk)*100:+.1f}%)")
+            result = content.strip()
+            if verbose:
+                elapsed_time = (time.perf_counter() - start_time) * 1000  # Convert to milliseconds
+                log.info(
+                    f"✅ Chunk {chunk_index + 1} completed in {elapsed_time:.2f}ms, "
+                    f"{len(chunk):,} → {len(result):,} chars ({(len(result)-len(chunk))/len(chunk)*100:+.1f}%)"
+                )
             return result
         except Exception as e:
-            elapsed_time = (time.perf_counter() - start_time) * 1000
-            print(f"❌ Chunk {chunk_index + 1} failed after {elapsed_time:.2f}ms: {str(e)}")
+            if verbose:
+                elapsed_time = (time.perf_counter() - start_time) * 1000
+                log.error(f"❌ Chunk {chunk_index + 1} failed after {elapsed_time:.2f}ms: {str(e)}")
+            else:
+                log.error(f"❌ Chunk {chunk_index + 1} failed: {str(e)}")
+            raise
+
+    def _cache_key(self, provider, system_prompt, chunk):
+        """Build the response cache key for a chunk conversion request"""
+        return ResponseCache.make_key(provider, self._get_model_name(provider), system_prompt, chunk)
+
+    async def _convert_chunk(self, provider, chunk, system_prompt, chunk_index):
+        """
+        Convert a chunk of SQL, sharing one request between concurrent identical chunks.
+        
+        Files are converted concurrently, so the same chunk can be requested by several
+        files before the first conversion reaches the response cache. Later callers await
+        the in-flight conversion instead; it is cancelled only when every caller is.
+        """
+        return await ai_clients.share_inflight(
+            self._inflight,
+            (provider, system_prompt, chunk),
+            lambda: self._convert_chunk_once(provider, chunk, system_prompt, chunk_index)
+        )
+
+    async def _embed_chunk(self, chunk, chunk_index):
+        """Embed a chunk for the semantic cache within the OpenAI limits and retries; None if embedding fails"""
+        async def request():
+            response = await self.clients['openai'].embeddings.create(model=self.embedding_model, input=chunk)
+            return response.data[0].embedding
+        
+        tokens = ai_clients.count_tokens(chunk, self.embedding_model)
+        try:
+            return await self._request_with_retry(lambda: self._guarded('openai', tokens, request), chunk_index)
+        except Exception as e:
+            # A failed lookup is a cache miss; the chunk is still converted
+            log.warning(f"⚠️  Chunk {chunk_index + 1}: embedding failed ({type(e).__name__}), skipping the semantic cache")
             return None
 
-    def _split_sql_into_chunks(self, sql_content, chunk_size=2000):
-        """Split SQL content into manageable chunks"""
+    async def _convert_chunk_once(self, provider, chunk, system_prompt, chunk_index):
+        """Convert a chunk of SQL with the given provider, serving repeats from the response cache"""
+        cache_key = None
+        if self.response_cache:
+            cache_key = self._cache_key(provider, system_prompt, chunk)
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                if log.isEnabledFor(logging.INFO):
+                    log.info(f"⚡ Chunk {chunk_index + 1} served from response cache")
+                return cached
+        
+        embedding = None
+        if self.semantic_cache:
+            namespace = ResponseCache.make_key(provider, self._get_model_name(provider), system_prompt)
+            embedding = await self._embed_chunk(chunk, chunk_index)
+            # The similarity scan is linear in the cache size, so it runs off the event loop
+            cached = None
+            if embedding is not None:
+                cached = await asyncio.to_thread(self.semantic_cache.lookup, namespace, embedding, len(chunk))
+            if cached is not None:
+                if log.isEnabledFor(logging.INFO):
+                    log.info(f"⚡ Chunk {chunk_index + 1} served from semantic cache")
+                return cached
+        
+        result = await self._request_chunk(provider, chunk, system_prompt, chunk_index)
+        
+        if result:
+            if cache_key:
+                self.response_cache.set(cache_key, result)
+            if embedding is not None:
+                await asyncio.to_thread(self.semantic_cache.add, namespace, embedding, len(chunk), result)
+        return result
+
+    def _split_sql_into_chunks(self, sql_content, max_tokens=None):
+        """
+        Split SQL content into chunks of at most max_tokens tokens for conversion.
+        
+        Batches are delimited by GO separators. Consecutive small batches are packed
+        into one chunk (re-joined with GO) so each request carries more SQL; batches
+        over the budget are split on their own.
+        """
+        return list(self._iter_sql_chunks(sql_content, max_tokens))
+
+    def _iter_sql_chunks(self, sql_content, max_tokens=None):
+        """Yield the chunks of _split_sql_into_chunks as they are found, so conversion can start while splitting"""
         if not sql_content:
-            return []
-            
-        # Split by GO statements first
-        chunks = []
-        current_chunk = []
-        current_size = 0
-        
-        for line in sql_content.split('\n'):
-            line = line.strip()
-            if not line:
+            return
+        max_tokens = max_tokens or self.max_chunk_tokens
+        model = self._get_model_name(self.default_provider)
+        # Every batch after the first in a packed chunk also costs its GO separator
+        separator_tokens = ai_clients.count_tokens('\nGO\n', model)
+        
+        packed = []
+        packed_tokens = 0
+        
+        # Single lazy scan for batch separators; each batch is sliced out once
+        boundaries = itertools.chain(
+            ((m.start(), m.end()) for m in _GO_RE.finditer(sql_content) if m.lastgroup == 'go'),
+            [(len(sql_content), len(sql_content))]
+        )
+        last = 0
+        for end, next_start in boundaries:
+            batch = sql_content[last:end].strip()
+            last = next_start
+            if not batch:
                 continue
-                
-            # If line is 'GO', add current chunk and start new one
-            if line.upper() == 'GO':
-                if current_chunk:
-                    chunks.append('\n'.join(current_chunk))
-                    current_chunk = []
-                    current_size = 0
+            
+            tokens = ai_clients.count_tokens(batch, model)
+            if tokens > max_tokens:
+                # Pieces of a split batch must not be re-joined with GO
+                if packed:
+                    yield '\nGO\n'.join(packed)
+                    packed, packed_tokens = [], 0
+                yield from self._split_oversized_batch(batch, max_tokens, model)
                 continue
             
-            # Add line to current chunk
-            line_size = len(line)
-            if current_size + line_size > chunk_size and current_chunk:
-                chunks.append('\n'.join(current_chunk))
-                current_chunk = [line]
-                current_size = line_size
-            else:
-                current_chunk.append(line)
-                current_size += line_size
+            if packed:
+                if packed_tokens + separator_tokens + tokens > max_tokens:
+                    yield '\nGO\n'.join(packed)
+                    packed, packed_tokens = [], 0
+                else:
+                    tokens += separator_tokens
+            packed.append(batch)
+            packed_tokens += tokens
+        if packed:
+            yield '\nGO\n'.join(packed)
+
+    @staticmethod
+    def _split_oversized_batch(batch, max_tokens, model):
+        """Split a single batch at procedure boundaries, then blank lines, then lines, to fit max_tokens"""
+        def cut(text, positions):
+            return [text[i:j] for i, j in zip([0] + positions, positions + [len(text)])]
         
-        # Add final chunk if exists
-        if current_chunk:
-            chunks.append('\n'.join(current_chunk))
+        def pack(parts, refine):
+            # Greedily pack consecutive parts; parts that alone exceed the budget are refined further
+            chunks = []
+            current = []
+            current_tokens = 0
+            for part in parts:
+                tokens = ai_clients.count_tokens(part, model)
+                if tokens > max_tokens and refine:
+                    if current:
+                        chunks.append(''.join(current).strip())
+                        current, current_tokens = [], 0
+                    chunks.extend(refine(part))
+                    continue
+                if current_tokens + tokens > max_tokens and current:
+                    chunks.append(''.join(current).strip())
+                    current, current_tokens = [], 0
+                current.append(part)
+                current_tokens += tokens
+            if current:
+                chunks.append(''.join(current).strip())
+            return chunks
         
-        return chunks
+        def split_lines(paragraph):
+            return pack(paragraph.splitlines(keepends=True), None)
+        
+        def split_paragraphs(procedure):
+            return pack(cut(procedure, [m.end() for m in _BLANK_LINE_RE.finditer(procedure)]), split_lines)
+        
+        # Prefer cutting at CREATE PROC boundaries
+        procedures = cut(batch, [m.start() for m in _PROC_RE.finditer(batch) if m.start() > 0])
+        return [chunk for chunk in pack(procedures, split_paragraphs) if chunk]
     
-    async def _convert_sql_parallel(self, sql_content, system_prompt=None, provider=None):
-        """Convert SQL content in parallel"""
+    @staticmethod
+    def _validate_db_type(db_type):
+        """Return db_type if it is a supported database type, else raise ValueError"""
+        if db_type.upper() not in _VALID_DB_TYPES:
+            raise ValueError(f"Unsupported database type: {db_type}. Supported types: {', '.join(sorted(_VALID_DB_TYPES))}")
+        return db_type
+
+    def _load_prompt_template(self):
+        """Read the prompt template from disk on first use and keep it in memory, defaulting to the built-in one"""
+        if self._prompt_template is None:
+            prompt_path = os.path.join('prompts', 'optimized_prompt.txt')
+            try:
+                with open(prompt_path, 'r', encoding='utf-8') as f:
+                    self._prompt_template = f.read().strip()
+            except FileNotFoundError:
+                self._prompt_template = _DEFAULT_PROMPT_TEMPLATE
+        return self._prompt_template
+
+    def _prompt_template_changed(self):
+        """Whether the prompt template file was modified since it was last read; a missing file keeps the cached prompt"""
+        try:
+            mtime = os.stat(os.path.join('prompts', 'optimized_prompt.txt')).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._prompt_mtime:
+            return False
+        self._prompt_mtime = mtime
+        self._prompt_template = None
+        return True
+
+    def _load_system_prompt(self):
+        """Build the conversion system prompt once per source/target pair, falling back to a built-in default"""
+        # One stat per file converted; an edited template is picked up without a restart
+        if self._prompt_template_changed():
+            self._system_prompts.clear()
+        key = (self.source_db_type, self.target_db_type)
+        if key in self._system_prompts:
+            return self._system_prompts[key]
+        
+        try:
+            system_prompt = self._load_prompt_template().format(
+                source_type=self.source_db_type,
+                target_type=self.target_db_type
+            )
+        except Exception as e:
+            print(f"Error loading prompt: {str(e)}")
+            system_prompt = _DEFAULT_PROMPT_TEMPLATE.format(
+                source_type=self.source_db_type,
+                target_type=self.target_db_type
+            )
+        
+        # Static content first, run-level settings last
+        self._system_prompts[key] = (
+            f"{system_prompt.strip()}\n\n{_CONVERSION_DIRECTIVES}\n\n"
+            f"Source: {self.source_db_type}\nTarget: {self.target_db_type}\n"
+        )
+        return self._system_prompts[key]
+
+    async def _convert_sql_parallel(self, chunks, output, system_prompt=None, provider=None):
+        """
+        Convert SQL chunks in parallel, writing them to output in source order.
+        
+        chunks may be a lazy iterable: chunks are pulled in source order only while fewer
+        than a window (twice the concurrency cap) of pulled chunks are unwritten, so the
+        first requests go out while the rest of the file is still being split. Each chunk
+        is written as soon as it and every chunk before it are converted, so a slow chunk
+        holds back at most a window of results, not the rest of the file.
+        Returns False, and cancels the remaining requests, as soon as any chunk fails.
+        """
         start_time = time.perf_counter()
         
         # If no system_prompt is provided, use the default prompt
         if system_prompt is None:
-            try:
-                prompt_path = os.path.join('prompts', 'optimized_prompt.txt')
-                with open(prompt_path, 'r', encoding='utf-8') as f:
-                    system_prompt = f.read().strip()
-                system_prompt = system_prompt.format(
-                    source_type=self.source_db_type,
-                    target_type=self.target_db_type
-                )
-            except Exception as e:
-                print(f"Error loading prompt: {str(e)}")
-                system_prompt = f"""
-                You are a SQL conversion expert. Convert the provided SQL code from {self.source_db_type} 
-                to {self.target_db_type}, maintaining the same functionality while following best practices 
-                for the target database system. Preserve comments and formatting where possible.
-                """
-        
-        # Split SQL into chunks
-        chunks = self._split_sql_into_chunks(sql_content)
-        total_chunks = len(chunks)
-        total_chars = sum(len(c) for c in chunks)
-        avg_chunk_size = total_chars // total_chunks
-        max_chunk_size = max(len(c) for c in chunks)
+            system_prompt = self._load_system_prompt()
         
+        provider = provider or self.default_provider
         print(f"\n📊 Starting SQL Conversion:")
-        print(f"   • Total chunks: {total_chunks:,}")
-        print(f"   • Total size: {total_chars:,} chars")
-        print(f"   • Average chunk: {avg_chunk_size:,} chars")
-        print(f"   • Largest chunk: {max_chunk_size:,} chars")
-        print(f"   • Provider: {provider or self.default_provider}")
-        print(f"   • Model: {self._get_model_name(provider or self.default_provider)}")
+        print(f"   • Provider: {provider}")
+        print(f"   • Model: {self._get_model_name(provider)}")
         
-        # Convert chunks in parallel
-        tasks = []
-        for i, chunk in enumerate(chunks):
-            if provider == 'openai' or (provider is None and self.default_provider == 'openai'):
-                tasks.append(self._convert_chunk_openai(chunk, system_prompt, i))
-            elif provider == 'claude' or (provider is None and self.default_provider == 'claude'):
-                tasks.append(self._convert_chunk_claude(chunk, system_prompt, i))
+        async def convert(index, digest, chunk):
+            return digest, await self._convert_chunk(provider, chunk, system_prompt, index)
         
-        results = await asyncio.gather(*tasks)
+        # Size stats are gathered as chunks are pulled. Identical chunks waiting to be
+        # written at the same time are converted once; repeated blocks (GRANT/USE/SET ...)
+        # reuse the result, and later repeats are usually served by the response cache
+        chunks = iter(chunks)
+        total_chunks = 0
+        total_chars = 0
+        max_chunk_size = 0
+        duplicates = 0
+        order = collections.deque()  # Digests of pulled chunks not yet written
+        wanted = collections.Counter()  # Unwritten positions per digest
+        window = 2 * max(self.max_concurrency.values())
+        tasks = set()
+        
+        def start_more():
+            nonlocal total_chunks, total_chars, max_chunk_size, duplicates
+            # Bounded by unwritten positions, not requests in flight, so results
+            # waiting behind a slow chunk cannot pile up
+            while len(order) < window:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    return
+                size = len(chunk)
+                total_chars += size
+                if size > max_chunk_size:
+                    max_chunk_size = size
+                digest = hashlib.blake2b(chunk.encode('utf-8'), digest_size=16).digest()
+                if wanted[digest]:
+                    duplicates += 1
+                else:
+                    tasks.add(asyncio.ensure_future(convert(total_chunks, digest, chunk)))
+                wanted[digest] += 1
+                order.append(digest)
+                total_chunks += 1
+        
+        # Results wait in `ready` until every earlier position has been written
+        ready = {}
+        written = 0
+        total_output_chars = 0
+        error = None
+        try:
+            start_more()
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                tasks.difference_update(done)
+                for task in done:
+                    digest, result = task.result()
+                    ready[digest] = result
+                while order and order[0] in ready:
+                    digest = order.popleft()
+                    if written:
+                        output.write("\n\nGO\n\n")
+                    output.write(ready[digest])
+                    total_output_chars += len(ready[digest])
+                    wanted[digest] -= 1
+                    if not wanted[digest]:
+                        del wanted[digest]
+                        del ready[digest]
+                    written += 1
+                start_more()
+        except Exception as e:
+            error = e
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            # Semantic cache entries are committed in batches; persist this file's
+            if self.semantic_cache:
+                await asyncio.to_thread(self.semantic_cache.flush)
         
         # Process results
         total_time = (time.perf_counter() - start_time) * 1000
-        successful = len([r for r in results if r])
-        converted = [r for r in results if r]
-        total_output_chars = sum(len(r) for r in converted) if converted else 0
         
         print(f"\n📈 Conversion Summary:")
         print(f"   • Total time: {total_time:.2f}ms")
+        print(f"   • Total chunks: {total_chunks:,}")
         print(f"   • Average time per chunk: {total_time/total_chunks:.2f}ms")
-        print(f"   • Successful chunks: {successful:,}/{total_chunks:,}")
-        print(f"   • Failed chunks: {total_chunks - successful:,}")
+        print(f"   • Average chunk: {total_chars // total_chunks:,} chars")
+        print(f"   • Largest chunk: {max_chunk_size:,} chars")
+        if duplicates:
+            print(f"   • Duplicate chunks skipped: {duplicates:,}")
+        print(f"   • Converted chunks: {written:,}/{total_chunks:,}")
         print(f"   • Input size: {total_chars:,} chars")
         print(f"   • Output size: {total_output_chars:,} chars ({(total_output_chars-total_chars)/total_chars*100:+.1f}%)")
         
-        return "\n\nGO\n\n".join(converted) if converted else None
+        # Never report success with chunks silently missing
+        if error is not None or order:
+            print(f"❌ Chunk conversion failed ({error}); discarding incomplete conversion")
+            return False
+        return True
 
-    async def convert_sql(self, sql_content, source_type=None, target_type=None, provider=None):
-        """Convert SQL from source database type to target database type"""
-        source_type = source_type or self.source_db_type
-        target_type = target_type or self.target_db_type
+    async def _stream_conversion(self, sql_content, output, provider=None, chunks=None):
+        """Convert SQL from the source to the target database type into output, using chunks if already split; returns success"""
         provider = provider or self.default_provider
-        
-        if provider not in self.clients:
+        racing = provider == 'race' and len(self.clients) > 1
+        if provider not in self.clients and not racing:
             raise ValueError(f"Provider {provider} is not configured")
         
-        print(f"\nConverting from {source_type} to {target_type} using {provider} ({self._get_model_name(provider)})...\n")
+        print(f"\nConverting from {self.source_db_type} to {self.target_db_type} using {provider} ({self._get_model_name(provider)})...\n")
         conversion_start_time = time.time()
         
+        # Chunks are converted while the rest of the file is still being split
+        chunks = self._iter_sql_chunks(sql_content) if chunks is None else iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            print("No SQL statements found to convert")
+            return False
+        chunks = itertools.chain([first], chunks)
+        
         # 转换SQL
-        converted_sql = await self._convert_sql_parallel(sql_content, None, provider)
+        converted = await self._convert_sql_parallel(chunks, output, None, provider)
         
         # 记录总时间
         total_duration = time.time() - conversion_start_time
         print(f"\nTotal process completed in {total_duration:.2f} seconds")
         
-        return converted_sql
+        return converted
+
+    async def convert_sql(self, sql_content, source_type=None, target_type=None, provider=None):
+        """Convert SQL from source database type to target database type"""
+        output = io.StringIO()
+        if not await self._stream_conversion(sql_content, output, provider):
+            return None
+        return output.getvalue()
+
+    async def convert_sql_to_file(self, sql_content, target_file, provider=None, chunks=None):
+        """
+        Convert SQL and stream the result into target_file.
+        
+        Chunks are written to a temporary file in the target directory as they complete,
+        which replaces target_file only once every chunk has been converted. A file that
+        has already been split can pass its chunks instead of being split again.
+        """
+        target_dir = os.path.dirname(target_file) or '.'
+        os.makedirs(target_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                converted = await self._stream_conversion(sql_content, f, provider, chunks)
+            if converted:
+                os.replace(tmp_path, target_file)
+            return converted
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    async def convert_sql_batch(self, files, file_chunks=None, provider=None):
+        """
+        Convert multiple SQL files in one batch job, like convert_sql_batch_chunks.
+
+        Returns:
+            List[Tuple[str, str]]: List of tuples (file_path, converted_sql), where
+            converted_sql is None if any chunk of that file failed to convert
+        """
+        return [
+            (file_path, "\n\nGO\n\n".join(converted) if converted else None)
+            for file_path, converted in await self.convert_sql_batch_chunks(files, file_chunks, provider)
+        ]
+
+    async def convert_sql_batch_chunks(self, files, file_chunks=None, provider=None):
+        """
+        Convert multiple SQL files in one job through the provider's batch API
+        (OpenAI Batch API or Anthropic Message Batches).
+
+        Batch jobs are billed at a discount and are rate limited separately from
+        the live endpoint, at the cost of an asynchronous (up to 24h) turnaround.
+
+        Args:
+            files (List[Tuple[str, str]]): List of tuples (file_path, content),
+                as returned by load_sql_files
+            file_chunks (List[List[str]]): Optional pre-split chunks of each file
+            provider (str): Provider to use, defaults to the default provider
+
+        Returns:
+            List[Tuple[str, List[str]]]: List of tuples (file_path, converted_chunks),
+            where converted_chunks is None if any chunk of that file failed to convert
+        """
+        provider = provider or self.default_provider
+        if provider == 'race':
+            raise ValueError("Batch jobs cannot race providers; disable RACE_PROVIDERS")
+        if provider not in self.clients:
+            raise ValueError(f"Provider {provider} is not configured")
+
+        system_prompt = self._load_system_prompt()
+
+        # Collect one request per distinct uncached chunk, keyed by "<file_idx>-<chunk_idx>"
+        # of its first occurrence; repeats in any file reuse its response
+        if file_chunks is None:
+            file_chunks = [self._split_sql_into_chunks(sql_content) for _, sql_content in files]
+        results = [[None] * len(chunks) for chunks in file_chunks]
+        positions = {}
+        for file_idx, chunks in enumerate(file_chunks):
+            for chunk_idx, chunk in enumerate(chunks):
+                positions.setdefault(chunk, []).append((file_idx, chunk_idx))
+
+        requests = []
+        pending = {}
+        for chunk, places in positions.items():
+            cached = None
+            if self.response_cache:
+                cached = self.response_cache.get(self._cache_key(provider, system_prompt, chunk))
+            if cached is not None:
+                for file_idx, chunk_idx in places:
+                    results[file_idx][chunk_idx] = cached
+                continue
+            custom_id = f"{places[0][0]}-{places[0][1]}"
+            requests.append((custom_id, chunk))
+            pending[custom_id] = (chunk, places)
+
+        if requests:
+            print(f"\n📦 Submitting {provider} batch: {len(requests):,} chunks from {len(files):,} files")
+            if provider == 'openai':
+                responses = await self._run_openai_batch(requests, system_prompt)
+            else:
+                responses = await self._run_claude_batch(requests, system_prompt)
+
+            # Fan each response out to every position of its chunk
+            for custom_id, result in responses:
+                chunk, places = pending[custom_id]
+                for file_idx, chunk_idx in places:
+                    results[file_idx][chunk_idx] = result
+                if self.response_cache:
+                    self.response_cache.set(self._cache_key(provider, system_prompt, chunk), result)
+
+        return [
+            (file_path, converted if converted and all(converted) else None)
+            for (file_path, _), converted in zip(files, results)
+        ]
+
+    async def _run_openai_batch(self, requests, system_prompt):
+        """Submit (custom_id, chunk) requests as an OpenAI batch and return (custom_id, text) results"""
+        client = self.clients['openai']
+        lines = [
+            ai_clients.json_dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.openai_model,
+                    "temperature": 0,
+                    "seed": self.openai_seed,
+                    # Batch answers cannot be retried cheaply, so they get the full budget
+                    "max_tokens": _MAX_OUTPUT_TOKENS,
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": _USER_PREFIX + chunk}
+                    ]
+                }
+            })
+            for custom_id, chunk in requests
+        ]
+        batch_input = ('sql_conversion_batch.jsonl', b'\n'.join(lines))
+        input_file = await client.files.create(file=batch_input, purpose='batch')
+        batch = await client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h'
+        )
+
+        # Poll until the batch reaches a terminal state
+        poll_interval = float(os.getenv('BATCH_POLL_INTERVAL', '30'))
+        while batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+            await asyncio.sleep(poll_interval)
+            batch = await client.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            if counts:
+                print(f"   • Batch {batch.id}: {batch.status} ({counts.completed:,}/{counts.total:,} done, {counts.failed:,} failed)")
+
+        if batch.status != 'completed' or not batch.output_file_id:
+            print(f"❌ Batch {batch.id} finished with status '{batch.status}'")
+            return []
+
+        responses = []
+        output = await client.files.content(batch.output_file_id)
+        for line in output.content.splitlines():
+            if not line.strip():
+                continue
+            record = ai_clients.json_loads(line)
+            response = record.get('response') or {}
+            if record.get('error') or response.get('status_code') != 200:
+                log.error(f"❌ Batch request {record.get('custom_id')} failed: {record.get('error') or response.get('status_code')}")
+                continue
+            choices = response.get('body', {}).get('choices') or []
+            if not choices or not choices[0]['message'].get('content'):
+                continue
+            if choices[0].get('finish_reason') == 'length':
+                # Truncated SQL must neither be written nor cached
+                log.error(f"❌ Batch request {record['custom_id']} was truncated at {_MAX_OUTPUT_TOKENS} tokens")
+                continue
+            responses.append((record['custom_id'], choices[0]['message']['content'].strip()))
+        return responses
+
+    async def _run_claude_batch(self, requests, system_prompt):
+        """Submit (custom_id, chunk) requests as an Anthropic message batch and return (custom_id, text) results"""
+        client = self.clients['claude']
+        batch = await client.messages.batches.create(requests=[
+            {
+                "custom_id": custom_id,
+                "params": {
+                    "model": self.claude_model,
+                    # Batch answers cannot be retried cheaply, so they get the full budget
+                    "max_tokens": _MAX_OUTPUT_TOKENS,
+                    "temperature": 0,
+                    "system": self._claude_system(system_prompt),
+                    "messages": [{"role": "user", "content": _USER_PREFIX + chunk}]
+                }
+            }
+            for custom_id, chunk in requests
+        ])
+
+        # Poll until every request in the batch has been processed
+        poll_interval = float(os.getenv('BATCH_POLL_INTERVAL', '30'))
+        while batch.processing_status != 'ended':
+            await asyncio.sleep(poll_interval)
+            batch = await client.messages.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            print(f"   • Batch {batch.id}: {batch.processing_status} ({counts.succeeded:,} succeeded, {counts.processing:,} processing, {counts.errored:,} errored)")
+
+        responses = []
+        async for entry in await client.messages.batches.results(batch.id):
+            if entry.result.type != 'succeeded':
+                log.error(f"❌ Batch request {entry.custom_id} failed: {entry.result.type}")
+                continue
+            content = entry.result.message.content
+            if not content or not content[0].text.strip():
+                continue
+            if entry.result.message.stop_reason == 'max_tokens':
+                # Truncated SQL must neither be written nor cached
+                log.error(f"❌ Batch request {entry.custom_id} was truncated at {_MAX_OUTPUT_TOKENS} tokens")
+                continue
+            responses.append((entry.custom_id, content[0].text.strip()))
+        return responses
 
     def _get_model_name(self, provider):
         """Get the model name for the specified provider"""
@@ -242,8 +882,53 @@ class SQLConverter:
             return self.openai_model
         elif provider == 'claude':
             return self.claude_model
+        elif provider == 'race':
+            return f"{self.openai_model}+{self.claude_model}"
         return 'unknown'
 
+    @staticmethod
+    def _resolve_sql_paths(source_path):
+        """
+        Resolve the source path configuration to a list of SQL file paths.
+        
+        See load_sql_files for the supported formats. Paths are not checked for
+        existence here; reading a missing file raises FileNotFoundError.
+        """
+        return list(SQLConverter._iter_sql_paths(source_path))
+
+    @staticmethod
+    def _iter_sql_paths(source_path):
+        """Yield the SQL file paths for one source path entry, recursing into ';'-separated lists"""
+        if ';' in source_path:
+            for path in source_path.split(';'):
+                if path.strip():
+                    yield from SQLConverter._iter_sql_paths(path.strip())
+        elif any(ch in source_path for ch in '*?['):
+            # iglob is scandir-based and yields matches lazily
+            yield from glob.iglob(source_path)
+        elif os.path.isdir(source_path):
+            yield from SQLConverter._iter_sql_files(source_path)
+        else:
+            yield source_path
+
+    @staticmethod
+    def _iter_sql_files(root):
+        """Yield all .sql files below root, using os.scandir entries to avoid extra stat calls"""
+        pending = [root]
+        while pending:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.endswith('.sql') and entry.is_file():
+                        yield entry.path
+
+    @staticmethod
+    def _read_sql_file(file_path):
+        """Read a SQL file, returning a tuple (file_path, content)"""
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return file_path, f.read()
+
     @staticmethod
     def load_sql_files(source_path):
         """
@@ -261,42 +946,25 @@ class SQLConverter:
         Raises:
             FileNotFoundError: If any specified file is not found
         """
-        files_content = []
-        
-        # Check if path contains semicolons (multiple files)
-        if ';' in source_path:
-            paths = source_path.split(';')
-            for path in paths:
-                # Handle wildcards
-                if '*' in path:
-                    for file_path in glob.glob(path):
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            files_content.append((file_path, f.read()))
-                else:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        files_content.append((path, f.read()))
-        
-        # Check for wildcard pattern
-        elif '*' in source_path:
-            for file_path in glob.glob(source_path):
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    files_content.append((file_path, f.read()))
-        
-        # Check if it's a directory
-        elif os.path.isdir(source_path):
-            for root, _, files in os.walk(source_path):
-                for file in files:
-                    if file.endswith('.sql'):
-                        file_path = os.path.join(root, file)
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            files_content.append((file_path, f.read()))
-        
-        # Single file
-        else:
-            with open(source_path, 'r', encoding='utf-8') as f:
-                files_content.append((source_path, f.read()))
+        return [SQLConverter._read_sql_file(path) for path in SQLConverter._resolve_sql_paths(source_path)]
+
+    @staticmethod
+    async def load_sql_files_async(source_path):
+        """
+        Load SQL files like load_sql_files, reading all files concurrently off the event loop.
         
-        return files_content
+        Returns:
+            List[Tuple[str, str]]: List of tuples (file_path, content)
+        """
+        file_paths = await asyncio.to_thread(SQLConverter._resolve_sql_paths, source_path)
+        return await SQLConverter._read_sql_files_async(file_paths)
+
+    @staticmethod
+    async def _read_sql_files_async(file_paths):
+        """Read the given SQL files concurrently off the event loop"""
+        return list(await asyncio.gather(*(
+            asyncio.to_thread(SQLConverter._read_sql_file, path) for path in file_paths
+        )))
 
 def get_target_file_path(source_file, target_config, target_db_type, provider, model_name):
     """
@@ -320,53 +988,131 @@ def get_target_file_path(source_file, target_config, target_db_type, provider, m
         return os.path.join(dir_name, new_name)
     return target_config
 
+def get_converter_target_path(converter, source_file):
+    """Target file path of a source file for the converter's configuration"""
+    return get_target_file_path(
+        source_file,
+        converter.target_config,
+        converter.target_db_type,
+        converter.default_provider,
+        converter._get_model_name(converter.default_provider)
+    )
+
+def save_converted_chunks(converter, source_file, converted_chunks):
+    """
+    Write converted chunks, separated by GO, without first joining them into one string
+    Args:
+        converter: SQLConverter instance used for the conversion
+        source_file: Source SQL file path
+        converted_chunks: Converted SQL chunks, or None if the conversion failed
+    """
+    if not converted_chunks:
+        print(f"Failed to convert SQL from file: {source_file}")
+        return
+    
+    # Generate target file path
+    target_file = get_converter_target_path(converter, source_file)
+    
+    # Create target directory if it doesn't exist
+    os.makedirs(os.path.dirname(target_file) or '.', exist_ok=True)
+    
+    # Write converted SQL to file
+    with open(target_file, 'w', encoding='utf-8') as f:
+        f.write(converted_chunks[0])
+        for chunk in converted_chunks[1:]:
+            f.write("\n\nGO\n\n")
+            f.write(chunk)
+    print(f"Converted SQL saved to: {target_file}")
+
+async def process_file(converter, source_file, sql_content, chunks=None):
+    """Convert a single SQL file (or its already split chunks), streaming the result to its target file"""
+    print(f"\nProcessing file: {source_file}")
+    try:
+        target_file = get_converter_target_path(converter, source_file)
+        if await converter.convert_sql_to_file(sql_content, target_file, chunks=chunks):
+            print(f"Converted SQL saved to: {target_file}")
+        else:
+            print(f"Failed to convert SQL from file: {source_file}")
+    except Exception as e:
+        print(f"Error converting {source_file}: {str(e)}")
+
+async def read_and_process_file(converter, source_file):
+    """Read a single SQL file off the event loop, then convert it as soon as it is loaded"""
+    try:
+        _, sql_content = await asyncio.to_thread(SQLConverter._read_sql_file, source_file)
+    except Exception as e:
+        print(f"Error reading {source_file}: {str(e)}")
+        return
+    await process_file(converter, source_file, sql_content)
+
+def setup_logging():
+    """
+    Print log records from a background thread.
+    
+    Records are handed to a queue and written by a QueueListener thread, so the event
+    loop never waits on stdout. The level is read from LOG_LEVEL (default INFO; DEBUG
+    also logs each chunk as it starts). Returns the started listener.
+    """
+    log_queue = queue.SimpleQueue()
+    logging.basicConfig(
+        level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+        format='%(message)s',
+        handlers=[logging.handlers.QueueHandler(log_queue)]
+    )
+    listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    listener.start()
+    return listener
+
 async def main():
     """Main entry point of the SQL converter"""
+    listener = setup_logging()
     try:
         # Initialize converter
         converter = SQLConverter()
         
-        # Load SQL files
-        sql_files = SQLConverter.load_sql_files(converter.source_path)
-        if not sql_files:
+        # Find SQL files
+        file_paths = await asyncio.to_thread(SQLConverter._resolve_sql_paths, converter.source_path)
+        if not file_paths:
             print("No SQL files found to convert")
             return
         
-        print(f"\nFound {len(sql_files)} SQL files to convert")
+        print(f"\nFound {len(file_paths)} SQL files to convert")
         
-        # Process each SQL file
-        for source_file, sql_content in sql_files:
-            print(f"\nProcessing file: {source_file}")
-            
-            # Convert SQL content
-            converted_sql = await converter.convert_sql(
-                sql_content,
-                converter.source_db_type,
-                converter.target_db_type
-            )
-            
-            if converted_sql:
-                # Generate target file path
-                target_file = get_target_file_path(
-                    source_file,
-                    converter.target_config,
-                    converter.target_db_type,
-                    converter.default_provider,
-                    converter._get_model_name(converter.default_provider)
-                )
-                
-                # Create target directory if it doesn't exist
-                os.makedirs(os.path.dirname(target_file), exist_ok=True)
-                
-                # Write converted SQL to file
-                with open(target_file, 'w', encoding='utf-8') as f:
-                    f.write(converted_sql)
-                print(f"Converted SQL saved to: {target_file}")
-            else:
-                print(f"Failed to convert SQL from file: {source_file}")
+        # Offline bulk conversion through the provider's batch API, either on request
+        # or once the run is large enough for the discount to outweigh the turnaround
+        use_batch_api = os.getenv('USE_BATCH_API', 'false').lower() == 'true'
+        batch_min_chunks = int(os.getenv('BATCH_API_MIN_CHUNKS', '0'))
+        if use_batch_api or batch_min_chunks:
+            sql_files = await SQLConverter._read_sql_files_async(file_paths)
+            file_chunks = None
+            if not use_batch_api:
+                file_chunks = [converter._split_sql_into_chunks(sql_content) for _, sql_content in sql_files]
+                use_batch_api = sum(len(chunks) for chunks in file_chunks) >= batch_min_chunks
+            if use_batch_api:
+                for source_file, converted_chunks in await converter.convert_sql_batch_chunks(sql_files, file_chunks):
+                    save_converted_chunks(converter, source_file, converted_chunks)
+                return
+            # Below the threshold the files are converted live, reusing their chunks
+            await asyncio.gather(*(
+                process_file(converter, source_file, sql_content, chunks)
+                for (source_file, sql_content), chunks in zip(sql_files, file_chunks)
+            ))
+            return
+        
+        # Read and process all SQL files concurrently, so each file's requests start as soon
+        # as it is loaded; the converter's semaphores bound the API load
+        await asyncio.gather(*(
+            read_and_process_file(converter, source_file)
+            for source_file in file_paths
+        ))
     
     except Exception as e:
         print(f"Error: {str(e)}")
+    
+    finally:
+        # Release the shared connection pool and flush pending log records
+        await ai_clients.aclose()
+        listener.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
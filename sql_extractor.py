@@ -1,13 +1,19 @@
 import os
-from typing import List
+import re
+from typing import Iterable, Iterator, List
 import asyncio
-import openai
-from openai import OpenAI
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+import ai_clients
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+
+# A line starting a procedure (group 1, with the last word of the line as its name in
+# group 2) or a GO batch separator
+_PROC_BOUNDARY_RE = re.compile(r"(?im)^[ \t]*(?:(create[ \t]+proc\w*)(?:[^\n]*?[ \t](\S+))?[ \t\r]*|go[ \t]*\r?)$")
+# The first line of a procedure body
+_BODY_START_RE = re.compile(r"(?im)^[ \t]*(?:as|begin)\b")
 
 class SQLExtraction(BaseModel):
     proc_name: str
@@ -17,6 +23,74 @@ class SQLExtraction(BaseModel):
     inout_params: list[str]
     related_tables: list[str]
 
+class SQLExtractionList(BaseModel):
+    extractions: list[SQLExtraction]
+
+# Shared by every request and sent first, so consecutive requests start with the same
+# prefix (after the tool schema) and can be served from OpenAI's prompt cache
+_SYSTEM_PROMPT = """You are an expert in SQL who can analyze stored procedures and extract key information.
+Report it with the extract_sql_info tool:
+- proc_name: the procedure name as written in its CREATE statement
+- description: a clear description of what the procedure does
+- in_params, out_params, inout_params: the parameters by direction, with their names as declared
+- related_tables: every table the code reads or writes"""
+
+# Chunk-specific instructions, appended after the shared prompt; anything that changes from
+# one request to the next (procedure name, part number, procedure count) comes last.
+# Built once; formatted with proc_name, chunk_context and proc_count
+_CHUNK_PROMPTS = {
+    'header': """For this header section, focus on:
+    1. The procedure name
+    2. All input, output, and inout parameters
+    Leave the description and related tables empty as they will be analyzed separately.""",
+    'body': """For this body section, focus on:
+    1. Understanding the procedure's purpose for the description
+    2. Identifying all tables referenced in the code
+    The parameters have already been analyzed.
+    This is the body of procedure {proc_name}{chunk_context}.""",
+    'packed': """Each procedure in the input is between -- PROC_START and -- PROC_END markers.
+    Analyze each one separately and return one extraction per procedure, in input order, with:
+    1. The procedure name
+    2. A clear description of its purpose
+    3. All input, output, and inout parameters
+    4. All tables referenced in the code
+    The input contains {proc_count} procedures.""",
+    'full': """Analyze the complete procedure to extract:
+    1. The procedure name
+    2. A clear description of its purpose
+    3. All input, output, and inout parameters
+    4. All tables referenced in the code"""
+}
+
+def _extract_tools(model: type[BaseModel]) -> List[dict]:
+    """Build the extract_sql_info tool definition returning the given model"""
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": "extract_sql_info",
+                "description": "Extract information from SQL stored procedure",
+                "parameters": model.model_json_schema()
+            }
+        }
+    ]
+
+# The JSON schemas are generated once instead of for every request
+_EXTRACT_TOOLS = _extract_tools(SQLExtraction)
+_PACKED_EXTRACT_TOOLS = _extract_tools(SQLExtractionList)
+_TOOL_CHOICE = {"type": "function", "function": {"name": "extract_sql_info"}}
+
+async def _gather_or_cancel(*aws):
+    """Like asyncio.gather, but cancel and await the other awaitables when one of them fails"""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
 class SQLExtractor:
     """
     A class for extracting and analyzing information from SQL stored procedures.
@@ -27,9 +101,10 @@ class SQLExtractor:
     API calls.
     
     Attributes:
-        client (OpenAI): OpenAI API client instance
+        client (AsyncOpenAI): Shared OpenAI API client instance
         model (str): Name of the OpenAI model to use, defaults to 'gpt-4o-mini'
-        partial_results (list): Temporary storage for procedure analysis results
+        partial_results (dict): Header results by procedure name, used by
+            extract_from_chunk when it is not given the merge state of a procedure
         max_input_tokens (int): Maximum number of tokens for API input, set to 6000
     
     Key Features:
@@ -45,26 +120,51 @@ class SQLExtractor:
         Initialize the SQLExtractor with OpenAI client and configuration.
         Sets up the API client, model selection, and token limits.
         """
-        self.client = OpenAI()
+        # Load environment variables
+        load_dotenv()
+        
+        self.client = ai_clients.get_async_openai_client()
         self.model = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
-        self.partial_results = []
+        self.partial_results = {}
+        # Descriptions and tables of multi-part bodies being merged, by procedure name
+        self._bodies = {}
         # Set max input tokens to 6k to leave room for output in 8k context window of OpenAI GPT4
         self.max_input_tokens = 6000
+        # Small procedures are sent together, up to this many per request
+        self.max_procs_per_request = int(os.getenv('EXTRACT_MAX_PROCS_PER_REQUEST', '10'))
+        self.max_attempts = int(os.getenv('MAX_RETRY_ATTEMPTS', '6'))
+        # Extraction requests in flight, shared by identical chunks
+        self._inflight = {}
+        # Extractions are cached like conversions, so unchanged procedures are not sent again
+        self.response_cache = None
+        if os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true':
+            self.response_cache = ResponseCache(
+                os.getenv('RESPONSE_CACHE_DIR', os.path.join('prompts', '_cache')),
+                int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '0'))
+            )
+        # Procedures are extracted concurrently; stay within the account's limits
+        # instead of bursting into 429s (same settings as the converter)
+        self.semaphore = asyncio.Semaphore(int(os.getenv('OPENAI_MAX_CONCURRENCY', '20')))
+        self.rate_limiter = RateLimiter(
+            int(os.getenv('OPENAI_MAX_REQUESTS_PER_MINUTE', '0')),
+            int(os.getenv('OPENAI_MAX_TOKENS_PER_MINUTE', '0'))
+        )
 
     def _estimate_tokens(self, text: str) -> int:
         """
-        Estimate the number of tokens in a text string.
+        Count the number of tokens in a text string for the configured model.
         
-        Uses a conservative estimate where 1 token ≈ 3 characters for SQL code,
-        which typically has more special characters than regular text.
+        Uses tiktoken when it is installed. Otherwise falls back to a conservative
+        estimate where 1 token ≈ 3 characters for SQL code, which typically has more
+        special characters than regular text.
         
         Args:
-            text (str): The text to estimate tokens for
+            text (str): The text to count tokens for
             
         Returns:
-            int: Estimated number of tokens in the text
+            int: Number of tokens in the text
         """
-        return len(text) // 3
+        return ai_clients.count_tokens(text, self.model)
 
     def _split_sql_into_chunks(self, sql_content: str) -> List[dict]:
         """
@@ -85,122 +185,293 @@ class SQLExtractor:
                 - chunk_index: Index for multi-part bodies
                 - total_chunks: Total number of body chunks
         """
+        return list(self._iter_sql_chunks(sql_content))
+
+    def _iter_sql_chunks(self, sql_content: str) -> Iterator[dict]:
+        """
+        Yield the chunks of _split_sql_into_chunks one procedure at a time, as they are found.
+        
+        Args:
+            sql_content (str): The full SQL content to split
+            
+        Yields:
+            dict: Non-empty chunks, in file order
+        """
         if not sql_content:
-            return []
+            return
+
+        proc_start = None
+        proc_name = ""
+
+        # One regex sweep finds every CREATE PROC and GO line; chunks are sliced
+        # from the original string instead of being re-joined line by line
+        for match in _PROC_BOUNDARY_RE.finditer(sql_content):
+            if match.group(1):
+                # Start of a new procedure; an unterminated previous one is saved as is
+                if proc_start is not None:
+                    content = sql_content[proc_start:match.start() - 1]
+                    if content and not content.isspace():
+                        yield {'type': 'full', 'content': content, 'proc_name': proc_name}
+                proc_start = match.start()
+                proc_name = match.group(2) or match.group(1).split()[-1]  # Get procedure name
+            elif proc_start is not None:
+                # End of procedure (GO statement)
+                for chunk in self._procedure_chunks(sql_content[proc_start:match.end()], proc_name):
+                    if chunk['content'] and not chunk['content'].isspace():
+                        yield chunk
+                proc_start = None
+                proc_name = ""
+
+        # Add final chunk if exists
+        if proc_start is not None and not sql_content[proc_start:].isspace():
+            yield {'type': 'full', 'content': sql_content[proc_start:], 'proc_name': proc_name}
+
+    def _procedure_chunks(self, proc_content: str, proc_name: str) -> List[dict]:
+        """
+        Build the chunks of one complete procedure, splitting it if it is too long.
+        
+        Procedures within max_input_tokens become a single 'full' chunk. Longer ones are
+        split into a header (up to the first AS/BEGIN line, for parameters) and a body
+        (for logic analysis); a body that is still too long is split at line boundaries.
+        
+        Args:
+            proc_content (str): The procedure, from its CREATE line through GO
+            proc_name (str): Name of the procedure
+            
+        Returns:
+            List[dict]: The procedure's chunks
+        """
+        if self._estimate_tokens(proc_content) <= self.max_input_tokens:
+            return [{
+                'type': 'full',
+                'content': proc_content,
+                'proc_name': proc_name
+            }]
+
+        # Split into header (for parameters) and body (for logic analysis)
+        body_start = _BODY_START_RE.search(proc_content)
+        if body_start:
+            header_content = proc_content[:body_start.start() - 1]
+            body_content = proc_content[body_start.start():]
+        else:
+            header_content, body_content = proc_content, ''
+
+        chunks = [{
+            'type': 'header',
+            'content': header_content,
+            'proc_name': proc_name
+        }]
+
+        if self._estimate_tokens(body_content) <= self.max_input_tokens:
+            chunks.append({
+                'type': 'body',
+                'content': body_content,
+                'proc_name': proc_name
+            })
+            return chunks
+
+        # Body is still too long, split it into smaller chunks at line boundaries
+        body_chunks = []
+        chunk_start = 0
+        current_tokens = 0
+        line_start = 0
+        while line_start < len(body_content):
+            line_end = body_content.find('\n', line_start)
+            if line_end == -1:
+                line_end = len(body_content)
+            line_tokens = self._estimate_tokens(body_content[line_start:line_end])
+            if current_tokens + line_tokens > self.max_input_tokens and line_start > chunk_start:
+                body_chunks.append(body_content[chunk_start:line_start - 1])
+                chunk_start = line_start
+                current_tokens = 0
+            current_tokens += line_tokens
+            line_start = line_end + 1
+        body_chunks.append(body_content[chunk_start:])
+
+        for i, body_chunk in enumerate(body_chunks):
+            chunks.append({
+                'type': 'body',
+                'content': body_chunk,
+                'proc_name': proc_name,
+                'chunk_index': i,
+                'total_chunks': len(body_chunks)
+            })
+        return chunks
+
+    def _pack_chunks(self, chunks: Iterable[dict]) -> Iterator[dict]:
+        """
+        Pack runs of small full procedures into combined requests.
+        
+        Consecutive 'full' chunks are grouped while their estimated tokens, together with
+        the packed system prompt and the markers, stay within max_input_tokens and the
+        group holds at most max_procs_per_request procedures.
+        Each procedure is wrapped in PROC_START/PROC_END markers so the model can
+        return one extraction per procedure. Header and body chunks are left as is.
+        
+        Args:
+            chunks (Iterable[dict]): Chunks from _iter_sql_chunks
             
-        chunks = []
-        current_chunk = []
-        in_procedure = False
-        current_proc_name = ""
+        Yields:
+            dict: Chunks where each group of two or more procedures is replaced by
+                a 'packed' chunk whose 'chunks' holds the original chunks
+        """
+        # Packed requests share one system prompt (up to the procedure count), so it is counted once
+        budget = self.max_input_tokens - ai_clients.count_prompt_tokens(
+            _SYSTEM_PROMPT + "\n\n" + _CHUNK_PROMPTS['packed'], self.model
+        )
+        group = []
+        group_tokens = 0
+        for chunk in chunks:
+            if chunk['type'] != 'full':
+                yield from self._packed_group(group)
+                group, group_tokens = [], 0
+                yield chunk
+                continue
+            tokens = self._estimate_tokens(f"-- PROC_START {chunk['proc_name']}\n{chunk['content']}\n-- PROC_END\n")
+            if group and group_tokens + tokens > budget:
+                yield from self._packed_group(group)
+                group, group_tokens = [], 0
+            group.append(chunk)
+            group_tokens += tokens
+            # A full group is emitted right away instead of waiting for the next chunk
+            if len(group) >= self.max_procs_per_request:
+                yield from self._packed_group(group)
+                group, group_tokens = [], 0
+        yield from self._packed_group(group)
+
+    @staticmethod
+    def _packed_group(group: List[dict]) -> List[dict]:
+        """Return a group of full chunks as one packed chunk, or unchanged if it has fewer than two"""
+        if len(group) < 2:
+            return group
+        return [{
+            'type': 'packed',
+            'content': '\n'.join(
+                f"-- PROC_START {c['proc_name']}\n{c['content']}\n-- PROC_END" for c in group
+            ),
+            'proc_name': ', '.join(c['proc_name'] for c in group),
+            'chunks': group
+        }]
+
+    def _request_body(self, chunk: dict) -> dict:
+        """
+        Build the chat completion request for a chunk.
         
-        for line in sql_content.split('\n'):
-            line_lower = line.strip().lower()
+        The system prompt is the shared preamble followed by instructions for the
+        chunk type: headers are analyzed for parameters, bodies for description and
+        tables, full procedures for both.
+        
+        Args:
+            chunk (dict): The chunk to process, containing type and content
             
-            # Start of a new procedure
-            if line_lower.startswith('create proc') or line_lower.startswith('create procedure'):
-                # If we were already in a procedure, save it
-                if in_procedure and current_chunk:
-                    chunks.append({
-                        'type': 'full',
-                        'content': '\n'.join(current_chunk),
-                        'proc_name': current_proc_name
-                    })
-                    current_chunk = []
-                in_procedure = True
-                current_proc_name = line.split()[-1].strip()  # Get procedure name
+        Returns:
+            dict: Keyword arguments for chat.completions.create
+        """
+        chunk_context = ""
+        if 'chunk_index' in chunk:
+            chunk_context = f" (Part {chunk['chunk_index'] + 1} of {chunk['total_chunks']})"
+        system_prompt = _SYSTEM_PROMPT + "\n\n" + _CHUNK_PROMPTS[chunk['type']].format(
+            proc_name=chunk['proc_name'],
+            chunk_context=chunk_context,
+            proc_count=len(chunk.get('chunks', ()))
+        )
+
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": chunk['content']}
+            ],
+            "tools": _PACKED_EXTRACT_TOOLS if chunk['type'] == 'packed' else _EXTRACT_TOOLS,
+            "tool_choice": _TOOL_CHOICE
+        }
+
+    def _cache_key(self, request: dict, chunk: dict) -> str:
+        """Response cache key of a chunk's request: model, system prompt and chunk"""
+        return ResponseCache.make_key('openai', self.model, request['messages'][0]['content'], chunk['content'])
+
+    def _parse_arguments(self, chunk: dict, arguments: str) -> SQLExtraction | List[SQLExtraction]:
+        """
+        Validate the tool call arguments returned for a chunk.
+        
+        Args:
+            chunk (dict): The chunk the arguments belong to
+            arguments (str): JSON arguments of the extract_sql_info tool call
             
-            # If we're in a procedure, collect the line
-            if in_procedure:
-                current_chunk.append(line)
-                
-                # Check for end of procedure (GO statement)
-                if line_lower == 'go':
-                    proc_content = '\n'.join(current_chunk)
-                    estimated_tokens = self._estimate_tokens(proc_content)
-                    
-                    # If procedure is too long, split it
-                    if estimated_tokens > self.max_input_tokens:
-                        # Split into header (for parameters) and body (for logic analysis)
-                        header_lines = []
-                        body_lines = []
-                        in_body = False
-                        for proc_line in current_chunk:
-                            proc_line_lower = proc_line.strip().lower()
-                            if proc_line_lower.startswith('as') or proc_line_lower.startswith('begin'):
-                                in_body = True
-                            if in_body:
-                                body_lines.append(proc_line)
-                            else:
-                                header_lines.append(proc_line)
-                        
-                        # If body is still too long, split it into smaller chunks
-                        body_content = '\n'.join(body_lines)
-                        if self._estimate_tokens(body_content) > self.max_input_tokens:
-                            # First chunk includes the procedure structure
-                            body_chunks = []
-                            current_body_chunk = []
-                            current_tokens = 0
-                            
-                            for body_line in body_lines:
-                                line_tokens = self._estimate_tokens(body_line)
-                                if current_tokens + line_tokens > self.max_input_tokens and current_body_chunk:
-                                    body_chunks.append('\n'.join(current_body_chunk))
-                                    current_body_chunk = []
-                                    current_tokens = 0
-                                current_body_chunk.append(body_line)
-                                current_tokens += line_tokens
-                            
-                            if current_body_chunk:
-                                body_chunks.append('\n'.join(current_body_chunk))
-                            
-                            # Add header chunk
-                            chunks.append({
-                                'type': 'header',
-                                'content': '\n'.join(header_lines),
-                                'proc_name': current_proc_name
-                            })
-                            
-                            # Add body chunks
-                            for i, body_chunk in enumerate(body_chunks):
-                                chunks.append({
-                                    'type': 'body',
-                                    'content': body_chunk,
-                                    'proc_name': current_proc_name,
-                                    'chunk_index': i,
-                                    'total_chunks': len(body_chunks)
-                                })
-                        else:
-                            chunks.append({
-                                'type': 'header',
-                                'content': '\n'.join(header_lines),
-                                'proc_name': current_proc_name
-                            })
-                            chunks.append({
-                                'type': 'body',
-                                'content': body_content,
-                                'proc_name': current_proc_name
-                            })
-                    else:
-                        chunks.append({
-                            'type': 'full',
-                            'content': proc_content,
-                            'proc_name': current_proc_name
-                        })
-                    current_chunk = []
-                    in_procedure = False
-                    current_proc_name = ""
+        Returns:
+            SQLExtraction | List[SQLExtraction]: One extraction, or the extractions
+                of a packed chunk (callers check there is one per procedure)
+        """
+        if chunk['type'] != 'packed':
+            return SQLExtraction.model_validate_json(arguments)
+        return SQLExtractionList.model_validate_json(arguments).extractions
+
+    def _finish_extraction(self, chunk: dict, extraction: SQLExtraction | List[SQLExtraction], partial_results: dict, bodies: dict) -> SQLExtraction | List[SQLExtraction] | None:
+        """Merge a body extraction with its header; packed and other extractions are returned as is"""
+        if chunk['type'] == 'packed':
+            return extraction
+        return self._merge_body(chunk, extraction, partial_results, bodies)
+
+    def _merge_body(self, chunk: dict, extraction: SQLExtraction, partial_results: dict, bodies: dict) -> SQLExtraction | None:
+        """
+        Merge a body extraction with the header result of its procedure.
         
-        # Add final chunk if exists
-        if current_chunk:
-            chunks.append({
-                'type': 'full',
-                'content': '\n'.join(current_chunk),
-                'proc_name': current_proc_name
-            })
+        Body results take their parameters from the header. For multi-part bodies the
+        descriptions and tables of the parts are collected and joined into the header
+        result, which becomes the procedure's result once the last part is merged.
         
-        return [chunk for chunk in chunks if chunk['content'].strip()]
+        Args:
+            chunk (dict): The chunk the extraction belongs to
+            extraction (SQLExtraction): The extraction returned by the API
+            partial_results (dict): Header results of the procedures being merged, by name
+            bodies (dict): Descriptions and tables of multi-part bodies being merged,
+                by procedure name
+            
+        Returns:
+            SQLExtraction | None: The extraction (the merged header result for the last
+                part of a multi-part body), or None for intermediate body parts
+        """
+        # Only body analyses update description and related_tables
+        if chunk['type'] == 'body':
+            prev_result = partial_results.get(chunk['proc_name'])
+            if prev_result is not None:
+                # Keep original parameters from header
+                extraction.in_params = prev_result.in_params
+                extraction.out_params = prev_result.out_params
+                extraction.inout_params = prev_result.inout_params
+
+                # For multi-chunk body, collect descriptions in a list and tables in a set,
+                # joining them only once the last part is in
+                if 'chunk_index' in chunk:
+                    if chunk['chunk_index'] == 0:
+                        bodies[chunk['proc_name']] = ([], set())
+                    descriptions, tables = bodies.setdefault(chunk['proc_name'], ([], set()))
+                    descriptions.append(extraction.description)
+                    tables.update(extraction.related_tables)
+                    if chunk['chunk_index'] < chunk['total_chunks'] - 1:
+                        return None  # Skip intermediate chunks
+                    del bodies[chunk['proc_name']]
+                    prev_result.description = "\n".join(descriptions)
+                    prev_result.related_tables = sorted(tables)
+                    return prev_result
+
+        return extraction
 
-    async def extract_from_chunk(self, chunk: dict, chunk_index: int = 0) -> SQLExtraction | None:
+    def _add_result(self, chunk: dict, result: SQLExtraction | List[SQLExtraction] | None, results: List[SQLExtraction], partial_results: dict):
+        """Record a chunk's extraction as a partial (header) or final result"""
+        if result:
+            if chunk['type'] == 'header':
+                # Keyed by the name the splitter found, which is what body chunks carry
+                partial_results[chunk['proc_name']] = result
+            elif chunk['type'] == 'full':
+                results.append(result)
+            elif chunk['type'] == 'packed':
+                results.extend(result)
+            elif chunk['type'] == 'body' and ('chunk_index' not in chunk or chunk['chunk_index'] == chunk['total_chunks'] - 1):
+                # Only add body result for single-chunk body or last chunk of multi-chunk body
+                results.append(result)
+
+    async def extract_from_chunk(self, chunk: dict, chunk_index: int = 0, partial_results: dict = None, bodies: dict = None) -> SQLExtraction | None:
         """
         Extract information from a SQL chunk with comprehensive error handling.
         
@@ -210,72 +481,65 @@ class SQLExtractor:
         Args:
             chunk (dict): The chunk to process, containing type and content
             chunk_index (int): Index of the chunk for logging purposes
+            partial_results (dict): Header results by procedure name to merge body chunks with,
+                defaults to self.partial_results
+            bodies (dict): Multi-part bodies being merged, defaults to self._bodies
             
         Returns:
             SQLExtraction | None: Extracted information or None if processing failed
             
         Error Handling:
-            - Retries on API timeouts and rate limits
-            - Handles token limit exceedance
-            - Manages API errors with exponential backoff
+            - Retries timeouts, rate limits, 5xx and malformed answers up to MAX_RETRY_ATTEMPTS times
+            - Waits for the server's Retry-After when given, otherwise uses jittered exponential backoff
+            - Fails immediately on other API errors and reports token limit exceedance
+        """
+        if partial_results is None:
+            partial_results = self.partial_results
+        if bodies is None:
+            bodies = self._bodies
+        arguments = await self._fetch_arguments(chunk, chunk_index)
+
+        # Every caller parses its own copy, since body results are merged in place
+        return self._finish_extraction(chunk, self._parse_arguments(chunk, arguments), partial_results, bodies)
+
+    async def _fetch_arguments(self, chunk: dict, chunk_index: int) -> str:
+        """Return the tool call arguments for a chunk from the response cache or the API, without merging them"""
+        request = self._request_body(chunk)
+        key = self._cache_key(request, chunk)
+
+        if self.response_cache is not None:
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                return cached
+
+        # Identical requests in flight (e.g. a procedure repeated in the file) share one API
+        # call, which is cancelled only when every caller is
+        return await ai_clients.share_inflight(
+            self._inflight, key, lambda: self._request_arguments(request, chunk, chunk_index, key)
+        )
+
+    async def _request_arguments(self, request: dict, chunk: dict, chunk_index: int, cache_key: str) -> str:
         """
-        max_retries = 3
-        retry_delay = 2  # seconds
+        Send an extraction request, retrying until it returns valid tool call arguments.
         
-        for attempt in range(max_retries):
+        Args:
+            request (dict): Keyword arguments for chat.completions.create
+            chunk (dict): The chunk being extracted
+            chunk_index (int): Index of the chunk for logging purposes
+            cache_key (str): Response cache key to store the arguments under
+            
+        Returns:
+            str: JSON arguments of the extract_sql_info tool call
+        """
+        tokens = self._estimate_tokens(request['messages'][0]['content'] + chunk['content'])
+        for attempt in range(1, self.max_attempts + 1):
             try:
-                system_prompt = "You are an expert in SQL who can analyze stored procedures and extract key information."
-                if chunk['type'] == 'header':
-                    system_prompt += """ For this header section, focus on:
-                    1. The procedure name
-                    2. All input, output, and inout parameters
-                    Leave the description and related tables empty as they will be analyzed separately."""
-                elif chunk['type'] == 'body':
-                    chunk_context = ""
-                    if 'chunk_index' in chunk:
-                        chunk_context = f" (Part {chunk['chunk_index'] + 1} of {chunk['total_chunks']})"
-                    system_prompt += f""" This is the body of procedure {chunk['proc_name']}{chunk_context}. Focus on:
-                    1. Understanding the procedure's purpose for the description
-                    2. Identifying all tables referenced in the code
-                    The parameters have already been analyzed."""
-                else:  # full
-                    system_prompt += """ Analyze the complete procedure to extract:
-                    1. The procedure name
-                    2. A clear description of its purpose
-                    3. All input, output, and inout parameters
-                    4. All tables referenced in the code"""
-
-                tools = [
-                    {
-                        "type": "function",
-                        "function": {
-                            "name": "extract_sql_info",
-                            "description": "Extract information from SQL stored procedure",
-                            "parameters": SQLExtraction.model_json_schema()
-                        }
-                    }
-                ]
-
-                try:
+                async with self.semaphore:
+                    await self.rate_limiter.acquire(tokens)
                     completion = await asyncio.wait_for(
-                        asyncio.to_thread(
-                            self.client.chat.completions.create,
-                            model=self.model,
-                            messages=[
-                                {"role": "system", "content": system_prompt},
-                                {"role": "user", "content": chunk['content']}
-                            ],
-                            tools=tools,
-                            tool_choice={"type": "function", "function": {"name": "extract_sql_info"}}
-                        ),
+                        self.client.chat.completions.create(**request),
                         timeout=30  # 30 seconds timeout
                     )
-                except asyncio.TimeoutError:
-                    if attempt < max_retries - 1:
-                        print(f"Timeout on attempt {attempt + 1}, retrying in {retry_delay} seconds...")
-                        await asyncio.sleep(retry_delay)
-                        continue
-                    raise TimeoutError("API request timed out after all retries")
 
                 if not completion.choices:
                     raise ValueError("No completion choices returned from API")
@@ -287,59 +551,74 @@ class SQLExtractor:
                     raise ValueError("No tool calls in response")
 
                 result = message.tool_calls[0].function.arguments
-                extraction = SQLExtraction.model_validate_json(result)
-
-                # If this is a body analysis, we only want to update description and related_tables
-                if chunk['type'] == 'body':
-                    # Find the header result in self.partial_results
-                    for prev_result in self.partial_results:
-                        if prev_result.proc_name == chunk['proc_name']:
-                            # Keep original parameters from header
-                            extraction.in_params = prev_result.in_params
-                            extraction.out_params = prev_result.out_params
-                            extraction.inout_params = prev_result.inout_params
-                            
-                            # For multi-chunk body, append description and merge tables
-                            if 'chunk_index' in chunk:
-                                if chunk['chunk_index'] > 0:
-                                    prev_result.description += "\n" + extraction.description
-                                    prev_result.related_tables = list(set(prev_result.related_tables + extraction.related_tables))
-                                    return None  # Skip intermediate chunks
-                                else:
-                                    prev_result.description = extraction.description
-                                    prev_result.related_tables = extraction.related_tables
-                            break
-
-                return extraction
-
-            except openai.RateLimitError as e:
-                if attempt < max_retries - 1:
-                    wait_time = (attempt + 1) * retry_delay
-                    print(f"Rate limit exceeded, waiting {wait_time} seconds...")
-                    await asyncio.sleep(wait_time)
-                    continue
-                raise Exception("Rate limit exceeded after all retries") from e
+                extraction = self._parse_arguments(chunk, result)
+                # A packed answer with the wrong number of extractions is not worth keeping
+                if self.response_cache is not None and (chunk['type'] != 'packed' or len(extraction) == len(chunk['chunks'])):
+                    self.response_cache.set(cache_key, result)
 
-            except openai.APIError as e:
-                if attempt < max_retries - 1:
-                    print(f"API error on attempt {attempt + 1}, retrying: {str(e)}")
-                    await asyncio.sleep(retry_delay)
-                    continue
-                raise Exception(f"OpenAI API error after all retries: {str(e)}") from e
+                return result
 
-            except openai.BadRequestError as e:
-                if "maximum context length" in str(e).lower():
-                    raise ValueError(f"Token limit exceeded for chunk {chunk_index}. Consider reducing chunk size.") from e
-                raise Exception(f"Bad request error: {str(e)}") from e
+            except Exception as e:
+                # The openai SDK is imported with the client, not with this module
+                if ai_clients.is_api_error(e, 'BadRequestError'):
+                    if "maximum context length" in str(e).lower():
+                        raise ValueError(f"Token limit exceeded for chunk {chunk_index}. Consider reducing chunk size.") from e
+                    raise Exception(f"Bad request error: {str(e)}") from e
+                if attempt == self.max_attempts or (ai_clients.is_api_error(e) and not ai_clients.is_retryable(e)):
+                    raise Exception(f"Failed to process chunk after {attempt} attempts: {str(e)}") from e
+                delay = ai_clients.retry_delay(e, attempt)
+                print(f"{type(e).__name__} on attempt {attempt}, retrying in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
 
+    async def _process_procedure(self, group: List[tuple]) -> List[SQLExtraction]:
+        """
+        Extract one procedure: a single full chunk, a header followed by its body chunks,
+        or a packed chunk of small procedures.
+        
+        The header is extracted first because body results take their parameters from it;
+        the body chunks are then requested together and merged in chunk order. The merge
+        state is local to the procedure, so procedures of any number of files can be
+        extracted at the same time.
+        
+        Args:
+            group (List[tuple]): (chunk_index, chunk) pairs belonging to one procedure
+            
+        Returns:
+            List[SQLExtraction]: The final results of this procedure (or packed procedures)
+        """
+        results = []
+        partial_results = {}
+        bodies = {}
+        (i, chunk), parts = group[0], group[1:]
+        if chunk['type'] == 'packed':
+            try:
+                result = await self.extract_from_chunk(chunk, i)
+                if len(result) != len(chunk['chunks']):
+                    raise ValueError(f"expected {len(chunk['chunks'])} extractions, got {len(result)}")
             except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"Unexpected error on attempt {attempt + 1}, retrying: {str(e)}")
-                    await asyncio.sleep(retry_delay)
-                    continue
-                raise Exception(f"Failed to process chunk after all retries: {str(e)}") from e
+                # Fall back to one request per procedure
+                print(f"Packed request for {chunk['proc_name']} failed, extracting separately: {str(e)}")
+                # Each procedure succeeds or fails on its own, like unpacked ones
+                singles = await _gather_or_cancel(*(self._process_procedure_or_report([(i, c)]) for c in chunk['chunks']))
+                return [result for results in singles for result in results]
+        else:
+            result = await self.extract_from_chunk(chunk, i, partial_results, bodies)
+        self._add_result(chunk, result, results, partial_results)
 
-        raise Exception("Failed to process chunk after exhausting all retries")
+        # Only the merge depends on the header, so the body requests run concurrently
+        arguments = await _gather_or_cancel(*(self._fetch_arguments(part, j) for j, part in parts))
+        for (j, part), part_arguments in zip(parts, arguments):
+            result = self._finish_extraction(part, self._parse_arguments(part, part_arguments), partial_results, bodies)
+            self._add_result(part, result, results, partial_results)
+        return results
+
+    async def _process_procedure_or_report(self, group: List[tuple]) -> List[SQLExtraction]:
+        """Extract one procedure, reporting a failure instead of failing the whole file"""
+        try:
+            return await self._process_procedure(group)
+        except Exception as e:
+            print(f"   ❌ Failed to extract {group[0][1]['proc_name']}: {str(e)}")
+            return []
 
     async def process_sql_file(self, file_path: str) -> List[SQLExtraction]:
         """
@@ -358,39 +637,201 @@ class SQLExtractor:
         Note:
             For multi-chunk procedures, only the final result is included in the
             return list, with intermediate results used for accumulating information.
+            A procedure that cannot be extracted is reported and left out; the rest
+            of the file's results are still returned.
         """
+        tasks = []
         try:
-            # Read SQL file
+            # Read and split the SQL file, sending small procedures together. Chunks are
+            # slices of the file, so the file itself is not kept while waiting on the API
             with open(file_path, 'r', encoding='utf-8') as f:
-                sql_content = f.read()
-
-            # Split into chunks
-            chunks = self._split_sql_into_chunks(sql_content)
+                chunks = self._pack_chunks(self._iter_sql_chunks(f.read()))
             print(f"\n📊 Processing SQL file: {file_path}")
-            print(f"   • Total chunks: {len(chunks)}")
 
-            # Store partial results for long procedures
-            self.partial_results = []
-            final_results = []
+            # Procedures are independent of each other, so each one is extracted as soon as
+            # the splitter has found all of its chunks, while the rest of the file is split;
+            # only a header and its body chunks depend on each other
+            group = []
+            total_chunks = 0
+            for total_chunks, chunk in enumerate(chunks, 1):
+                if chunk['type'] == 'body' and group:
+                    group.append((total_chunks - 1, chunk))
+                    continue
+                if group:
+                    tasks.append(asyncio.create_task(self._process_procedure_or_report(group)))
+                    group = []
+                if chunk['type'] == 'header':
+                    # Wait for the body chunks that follow
+                    group = [(total_chunks - 1, chunk)]
+                else:
+                    tasks.append(asyncio.create_task(self._process_procedure_or_report([(total_chunks - 1, chunk)])))
+                await asyncio.sleep(0)  # Let new requests go out before splitting on
+            if group:
+                tasks.append(asyncio.create_task(self._process_procedure_or_report(group)))
+            print(f"   • Total chunks: {total_chunks}")
 
-            # Process chunks in sequence (to handle dependencies between header and body)
-            for i, chunk in enumerate(chunks):
-                result = await self.extract_from_chunk(chunk, i)
-                if result:
-                    if chunk['type'] == 'header':
-                        self.partial_results.append(result)
-                    elif chunk['type'] == 'full':
-                        final_results.append(result)
-                    elif chunk['type'] == 'body' and ('chunk_index' not in chunk or chunk['chunk_index'] == chunk['total_chunks'] - 1):
-                        # Only add body result for single-chunk body or last chunk of multi-chunk body
-                        final_results.append(result)
+            # Report procedures as they finish; slow ones do not hold back the rest
+            for done in asyncio.as_completed(tasks):
+                for result in await done:
+                    print(f"   ✅ Extracted {result.proc_name}")
 
-            return final_results
+            # Results are returned in file order
+            return [result for task in tasks for result in task.result()]
 
         except Exception as e:
             print(f"Error processing file {file_path}: {str(e)}")
             return []
 
+        finally:
+            # Procedures already sent when reading or splitting failed (or the caller
+            # was cancelled) must not keep spending requests in the background
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def process_many_batch(self, file_paths: List[str]) -> List[SQLExtraction]:
+        """
+        Extract information from several SQL files with a single OpenAI Batch API job.
+        
+        Every chunk of every file is submitted as one batch request, which costs less
+        and does not count against the RPM/TPM limits but may take up to 24 hours.
+        Results are merged per file in chunk order, like process_sql_file.
+        Procedures of a packed request answered without one extraction each are
+        extracted again one by one through the live API.
+        
+        Args:
+            file_paths (List[str]): Paths to the SQL files to process
+            
+        Returns:
+            List[SQLExtraction]: List of extracted information for each procedure
+        """
+        file_chunks = []
+        for file_path in file_paths:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                file_chunks.append(list(self._pack_chunks(self._iter_sql_chunks(f.read()))))
+
+        # Chunks answered by an earlier (possibly interrupted) run are not submitted again
+        extractions = {}
+        cache_keys = {}
+        lines = []
+        for f, chunks in enumerate(file_chunks):
+            for c, chunk in enumerate(chunks):
+                custom_id = f"{f}-{c}"
+                request = self._request_body(chunk)
+                cache_keys[custom_id] = self._cache_key(request, chunk)
+                cached = self.response_cache.get(cache_keys[custom_id]) if self.response_cache is not None else None
+                if cached is not None:
+                    extractions[custom_id] = self._parse_arguments(chunk, cached)
+                    continue
+                lines.append(ai_clients.json_dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": request
+                }))
+
+        if lines:
+            print(f"\n📦 Submitting {len(lines):,} chunks from {len(file_paths)} files as one batch job ({len(extractions):,} cached)")
+            batch_extractions = await self._run_batch(lines, file_chunks, cache_keys)
+            if batch_extractions is None:
+                return []
+            extractions.update(batch_extractions)
+
+        # Merge in chunk order so body chunks find their header
+        final_results = []
+        fallbacks = []
+        for f, chunks in enumerate(file_chunks):
+            partial_results = {}
+            bodies = {}
+            for c, chunk in enumerate(chunks):
+                extraction = extractions.get(f"{f}-{c}")
+                if chunk['type'] == 'packed' and (extraction is None or len(extraction) != len(chunk['chunks'])):
+                    if extraction is not None:
+                        print(f"Batch request {f}-{c} returned {len(extraction)} extractions for {len(chunk['chunks'])} procedures")
+                    # Its procedures are extracted separately below, in its place
+                    fallbacks.append((len(final_results), c, chunk))
+                    continue
+                if extraction is not None:
+                    self._add_result(chunk, self._finish_extraction(chunk, extraction, partial_results, bodies), final_results, partial_results)
+
+        # Like process_sql_file, a packed request without one extraction per procedure
+        # falls back to one (live) request per procedure
+        if fallbacks:
+            print(f"🔁 Extracting the procedures of {len(fallbacks):,} packed batch requests separately")
+            singles = iter(await _gather_or_cancel(*(
+                self._process_procedure_or_report([(c, member)]) for _, c, chunk in fallbacks for member in chunk['chunks']
+            )))
+            pack_results = [[result for _ in chunk['chunks'] for result in next(singles)] for _, _, chunk in fallbacks]
+            for (position, _, _), results in reversed(list(zip(fallbacks, pack_results))):
+                final_results[position:position] = results
+        return final_results
+
+    async def _run_batch(self, lines: List[bytes], file_chunks: List[List[dict]], cache_keys: dict) -> dict | None:
+        """
+        Run JSONL requests as an OpenAI batch job and parse the answers.
+        
+        Each valid answer is also stored in the response cache, so a later run does
+        not submit it again.
+        
+        Args:
+            lines (List[bytes]): JSONL request lines with '{file}-{chunk}' custom ids
+            file_chunks (List[List[dict]]): Chunks of each file, indexed by the custom ids
+            cache_keys (dict): Response cache key of each custom id
+            
+        Returns:
+            dict | None: Extractions by custom id, or None if the batch did not complete
+        """
+        input_file = await self.client.files.create(
+            file=('sql_extraction_batch.jsonl', b'\n'.join(lines)),
+            purpose='batch'
+        )
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window='24h'
+        )
+
+        # Poll until the batch reaches a terminal state
+        poll_interval = float(os.getenv('BATCH_POLL_INTERVAL', '30'))
+        while batch.status not in ('completed', 'failed', 'expired', 'cancelled'):
+            await asyncio.sleep(poll_interval)
+            batch = await self.client.batches.retrieve(batch.id)
+
+        if batch.status != 'completed' or not batch.output_file_id:
+            print(f"❌ Batch {batch.id} finished with status '{batch.status}'")
+            return None
+
+        extractions = {}
+        output = await self.client.files.content(batch.output_file_id)
+        for line in output.content.splitlines():
+            if not line.strip():
+                continue
+            record = ai_clients.json_loads(line)
+            response = record.get('response') or {}
+            try:
+                message = response['body']['choices'][0]['message']
+                arguments = message['tool_calls'][0]['function']['arguments']
+                f, c = map(int, record['custom_id'].split('-'))
+                chunk = file_chunks[f][c]
+                extraction = self._parse_arguments(chunk, arguments)
+            except Exception as e:
+                print(f"Batch request {record.get('custom_id')} failed: {record.get('error') or e}")
+                continue
+            extractions[record['custom_id']] = extraction
+            if self.response_cache is not None and (chunk['type'] != 'packed' or len(extraction) == len(chunk['chunks'])):
+                self.response_cache.set(cache_keys[record['custom_id']], arguments)
+        return extractions
+
+def print_extraction(i: int, extraction: SQLExtraction):
+    """Print one extraction result"""
+    print(f"\n✨ Extraction {i}:")
+    print(f"   • Procedure: {extraction.proc_name}")
+    print(f"   • Description: {extraction.description}")
+    print(f"   • Input params: {', '.join(extraction.in_params)}")
+    print(f"   • Output params: {', '.join(extraction.out_params)}")
+    print(f"   • InOut params: {', '.join(extraction.inout_params)}")
+    print(f"   • Related tables: {', '.join(extraction.related_tables)}")
+
 async def main():
     extractor = SQLExtractor()
     sql_files_path = os.getenv('SOURCE_DB_CODE_FILE', './sql_files/*.sql')
@@ -399,20 +840,21 @@ async def main():
     import glob
     sql_files = glob.glob(sql_files_path)
     
-    all_results = []
-    for file_path in sql_files:
-        results = await extractor.process_sql_file(file_path)
-        all_results.extend(results)
-        
-    # Print results
-    for i, extraction in enumerate(all_results, 1):
-        print(f"\n✨ Extraction {i}:")
-        print(f"   • Procedure: {extraction.proc_name}")
-        print(f"   • Description: {extraction.description}")
-        print(f"   • Input params: {', '.join(extraction.in_params)}")
-        print(f"   • Output params: {', '.join(extraction.out_params)}")
-        print(f"   • InOut params: {', '.join(extraction.inout_params)}")
-        print(f"   • Related tables: {', '.join(extraction.related_tables)}")
+    count = 0
+    try:
+        if os.getenv('USE_BATCH_API', 'false').lower() == 'true':
+            for count, extraction in enumerate(await extractor.process_many_batch(sql_files), 1):
+                print_extraction(count, extraction)
+        else:
+            # Files are extracted concurrently and each one is printed as soon as it is done
+            tasks = [asyncio.create_task(extractor.process_sql_file(file_path)) for file_path in sql_files]
+            for done in asyncio.as_completed(tasks):
+                for extraction in await done:
+                    count += 1
+                    print_extraction(count, extraction)
+    finally:
+        # Release the shared connection pool
+        await ai_clients.aclose()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
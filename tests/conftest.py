@@ -0,0 +1,29 @@
+from types import SimpleNamespace
+
+import pytest
+
+import ai_clients
+from sql_converter import SQLConverter
+
+def make_converter(monkeypatch, path):
+    """Create an OpenAI-only SQLConverter with a placeholder client, isolated in path"""
+    monkeypatch.chdir(path)
+    monkeypatch.setenv('OPENAI_ENABLED', 'true')
+    monkeypatch.setenv('CLAUDE_ENABLED', 'false')
+    monkeypatch.setenv('DEFAULT_AI_PROVIDER', 'openai')
+    monkeypatch.setenv('OPENAI_MODEL', 'gpt-4o-mini')
+    monkeypatch.setenv('SOURCE_DB_TYPE', 'SYBASE')
+    monkeypatch.setenv('TARGET_DB_TYPE', 'POSTGRESQL')
+    monkeypatch.setattr(ai_clients, 'get_async_openai_client', lambda: SimpleNamespace())
+    return SQLConverter()
+
+@pytest.fixture
+def converter(tmp_path, monkeypatch):
+    """Create an OpenAI-only SQLConverter with a placeholder client, isolated in tmp_path"""
+    return make_converter(monkeypatch, tmp_path)
+
+@pytest.fixture(scope="module")
+def shared_converter(tmp_path_factory):
+    """One SQLConverter for a module whose tests only call its pure methods"""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        yield make_converter(monkeypatch, tmp_path_factory.mktemp("converter"))
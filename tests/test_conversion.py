@@ -0,0 +1,636 @@
+import os
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+import ai_clients
+import sql_converter
+from rate_limiter import RateLimiter
+from sql_converter import SQLConverter, process_file, read_and_process_file, save_converted_chunks
+
+async def make_stream(content, finish_reason='stop'):
+    """Build a minimal streamed chat completion, one event per word"""
+    for word in content.split(' '):
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + ' '), finish_reason=None)])
+    yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=None), finish_reason=finish_reason)])
+
+async def make_claude_stream(content, stop_reason='end_turn'):
+    """Build a minimal streamed Claude message, one text delta per word"""
+    for word in content.split(' '):
+        yield SimpleNamespace(type='content_block_delta', delta=SimpleNamespace(type='text_delta', text=word + ' '))
+    yield SimpleNamespace(type='message_delta', delta=SimpleNamespace(stop_reason=stop_reason))
+
+def use_openai_create(converter, create):
+    """Route the converter's OpenAI chat completions to a mock"""
+    converter.clients['openai'] = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+@pytest.mark.asyncio
+async def test_convert_sql_joins_chunks_in_order(converter):
+    """Test that converted chunks are re-assembled in source order"""
+    async def create(**kwargs):
+        return make_stream(kwargs['messages'][1]['content'].split('---\n')[1].replace('SELECT', 'select'))
+    use_openai_create(converter, create)
+    converter.max_chunk_tokens = 1
+    
+    result = await converter.convert_sql("SELECT 1\nGO\nSELECT 2", provider='openai')
+    
+    assert result == "select 1\n\nGO\n\nselect 2"
+
+@pytest.mark.asyncio
+async def test_duplicate_chunks_are_converted_once(converter):
+    """Test that identical chunks are sent once and replayed into every position"""
+    calls = []
+    async def create(**kwargs):
+        sql = kwargs['messages'][1]['content'].split('---\n')[1]
+        calls.append(sql)
+        return make_stream(sql.lower())
+    use_openai_create(converter, create)
+    converter.max_chunk_tokens = 1
+    
+    result = await converter.convert_sql("GRANT ALL\nGO\nSELECT 1\nGO\nGRANT ALL", provider='openai')
+    
+    assert sorted(calls) == ["GRANT ALL", "SELECT 1"]
+    assert result == "grant all\n\nGO\n\nselect 1\n\nGO\n\ngrant all"
+
+@pytest.mark.asyncio
+async def test_semantic_cache_embeddings_are_capped_and_failures_are_misses(converter, monkeypatch):
+    """Test that embeddings share the provider's concurrency cap and a failed one falls through to conversion"""
+    monkeypatch.setenv('SEMCACHE_THRESHOLD', '0.97')
+    converter = SQLConverter()
+    in_flight = []
+    peak = []
+    async def embed(**kwargs):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.pop()
+        raise ValueError("embedding service unavailable")
+    async def create(**kwargs):
+        return make_stream(kwargs['messages'][1]['content'].split('---\n')[1].lower())
+    converter.clients['openai'] = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create)),
+        embeddings=SimpleNamespace(create=embed)
+    )
+    converter.semaphores['openai'] = asyncio.Semaphore(1)
+    converter.max_chunk_tokens = 1
+    
+    result = await converter.convert_sql("SELECT 1\nGO\nSELECT 2", provider='openai')
+    
+    assert result == "select 1\n\nGO\n\nselect 2"
+    assert peak == [1, 1]
+
+@pytest.mark.asyncio
+async def test_semantic_cache_is_used_off_the_event_loop(converter, monkeypatch):
+    """Test that semantic cache lookups and additions run in worker threads"""
+    monkeypatch.setenv('SEMCACHE_THRESHOLD', '0.97')
+    converter = SQLConverter()
+    threads = []
+    async def embed(**kwargs):
+        return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0, 0.0])])
+    async def create(**kwargs):
+        return make_stream("select 1")
+    converter.clients['openai'] = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create)),
+        embeddings=SimpleNamespace(create=embed)
+    )
+    for name in ('lookup', 'add'):
+        method = getattr(converter.semantic_cache, name)
+        def recording(*args, method=method):
+            threads.append(threading.current_thread())
+            return method(*args)
+        monkeypatch.setattr(converter.semantic_cache, name, recording)
+    converter.response_cache = None
+    
+    assert await converter.convert_sql("SELECT 1") == "select 1"
+    assert await converter.convert_sql("SELECT 1") == "select 1"
+    assert len(threads) == 3  # Miss and add, then a hit
+    assert threading.current_thread() not in threads
+
+@pytest.mark.asyncio
+async def test_truncated_chunk_is_retried_with_full_budget(converter):
+    """Test that output cut off by the sized max_tokens is requested again with the full budget"""
+    budgets = []
+    async def create(**kwargs):
+        budgets.append(kwargs['max_tokens'])
+        if len(budgets) == 1:
+            return make_stream("select", finish_reason='length')
+        return make_stream("select 1")
+    use_openai_create(converter, create)
+    
+    result = await converter.convert_sql("SELECT 1", provider='openai')
+    
+    assert result == "select 1"
+    assert budgets[0] < budgets[1] == 4000
+
+@pytest.mark.asyncio
+async def test_output_truncated_at_full_budget_fails_the_chunk(converter):
+    """Test that output still cut off with the full budget fails the chunk and is not cached"""
+    budgets = []
+    async def create(**kwargs):
+        budgets.append(kwargs['max_tokens'])
+        return make_stream("select", finish_reason='length')
+    use_openai_create(converter, create)
+    
+    assert await converter.convert_sql("SELECT 1") is None
+    assert budgets[-1] == 4000
+    
+    # Nothing was cached, so a rerun asks the API again
+    calls = len(budgets)
+    await converter.convert_sql("SELECT 1")
+    assert len(budgets) > calls
+
+@pytest.mark.asyncio
+async def test_conversion_is_deterministic(converter):
+    """Test that chunks are requested at temperature 0 with the configured seed"""
+    requests = []
+    async def create(**kwargs):
+        requests.append(kwargs)
+        return make_stream("select 1")
+    use_openai_create(converter, create)
+    
+    await converter.convert_sql("SELECT 1", provider='openai')
+    
+    assert requests[0]['temperature'] == 0
+    assert requests[0]['seed'] == 7
+
+@pytest.mark.asyncio
+async def test_openai_chunks_are_awaited_natively(converter):
+    """Test that OpenAI chunks are awaited on the event loop thread, not offloaded to a worker thread"""
+    threads = []
+    async def create(**kwargs):
+        threads.append(threading.current_thread())
+        return make_stream("select 1")
+    use_openai_create(converter, create)
+    
+    assert await converter.convert_sql("SELECT 1") == "select 1"
+    assert threads == [threading.current_thread()]
+
+@pytest.mark.asyncio
+async def test_convert_chunk_openai_sends_one_streamed_request(converter):
+    """Test a single chunk request against the client alone, without the splitting and caching pipeline"""
+    create = AsyncMock(side_effect=lambda **kwargs: make_stream("select 1"))
+    use_openai_create(converter, create)
+    
+    result = await converter._convert_chunk_openai("SELECT 1", "system", 0, max_tokens=100, input_tokens=10)
+    
+    assert result == ("select 1 ", False)
+    create.assert_awaited_once()
+    assert create.await_args.kwargs['messages'][0] == {"role": "system", "content": "system"}
+    assert create.await_args.kwargs['messages'][1]['content'].endswith("SELECT 1")
+    assert create.await_args.kwargs['max_tokens'] == 100
+
+@pytest.mark.asyncio
+async def test_repeat_runs_are_served_from_response_cache(converter):
+    """Test that a rerun converts a chunk without calling the API, unless the database pair changes"""
+    calls = []
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return make_stream("select 1")
+    use_openai_create(converter, create)
+    
+    assert await converter.convert_sql("SELECT 1") == "select 1"
+    rerun = SQLConverter()
+    use_openai_create(rerun, create)
+    assert await rerun.convert_sql("SELECT 1") == "select 1"
+    assert len(calls) == 1
+    
+    other_target = SQLConverter(target_db_type='MYSQL')
+    use_openai_create(other_target, create)
+    await other_target.convert_sql("SELECT 1")
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_openai_stream_skips_role_and_usage_events(converter):
+    """Test that streamed deltas are accumulated around events that carry no content"""
+    async def stream():
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(role='assistant', content=None), finish_reason=None)])
+        async for event in make_stream("select 1 from t"):
+            yield event
+        yield SimpleNamespace(choices=[], usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5))
+    async def create(**kwargs):
+        assert kwargs['stream'] is True
+        return stream()
+    use_openai_create(converter, create)
+    
+    assert await converter.convert_sql("SELECT 1 FROM t") == "select 1 from t"
+
+@pytest.mark.asyncio
+async def test_claude_chunks_are_awaited_natively(converter):
+    """Test that Claude chunks are streamed from the async client with a cached system prompt"""
+    requests = []
+    async def create(**kwargs):
+        requests.append(kwargs)
+        return make_claude_stream("select 1")
+    converter.clients['claude'] = SimpleNamespace(messages=SimpleNamespace(create=create))
+    
+    assert await converter.convert_sql("SELECT 1", provider='claude') == "select 1"
+    assert requests[0]['system'][0]['cache_control'] == {"type": "ephemeral"}
+    assert requests[0]['stream'] is True
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped_per_provider(converter):
+    """Test that no more chunks are in flight than the provider's semaphore allows"""
+    in_flight = peak = 0
+    async def create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return make_claude_stream("select")
+    converter.clients['claude'] = SimpleNamespace(messages=SimpleNamespace(create=create))
+    converter.semaphores['claude'] = asyncio.Semaphore(2)
+    converter.max_chunk_tokens = 1
+    
+    await converter.convert_sql("\nGO\n".join(f"SELECT {i}" for i in range(6)), provider='claude')
+    
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_large_file_keeps_a_bounded_window_of_chunks(converter, monkeypatch):
+    """Test that a 1000-chunk file never has more than twice the concurrency cap of chunks pending or unwritten"""
+    in_flight = peak = 0
+    async def create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        sql = kwargs['messages'][1]['content'].split('\n')[-1]
+        # The first chunk is slow, so every later result has to wait for it
+        await asyncio.sleep(0.05 if sql == "SELECT 0" else 0)
+        in_flight -= 1
+        return make_stream(sql.lower())
+    use_openai_create(converter, create)
+    converter.max_concurrency = {'openai': 4, 'claude': 4}
+    converter.semaphores['openai'] = asyncio.Semaphore(4)
+    converter.max_chunk_tokens = 1
+    
+    pending = max_pending = 0
+    convert_chunk = converter._convert_chunk
+    async def counting_convert_chunk(*args):
+        nonlocal pending, max_pending
+        pending += 1
+        max_pending = max(max_pending, pending)
+        try:
+            return await convert_chunk(*args)
+        finally:
+            pending -= 1
+    monkeypatch.setattr(converter, '_convert_chunk', counting_convert_chunk)
+    
+    # Chunks pulled from the splitter but not yet written are the results held in memory
+    pulled = written = max_unwritten = 0
+    def chunks():
+        nonlocal pulled, max_unwritten
+        for i in range(1000):
+            pulled += 1
+            max_unwritten = max(max_unwritten, pulled - written)
+            yield f"SELECT {i}"
+    parts = []
+    def write(text):
+        nonlocal written
+        if text != "\n\nGO\n\n":
+            written += 1
+        parts.append(text)
+    
+    assert await converter._convert_sql_parallel(chunks(), SimpleNamespace(write=write))
+    
+    assert "".join(parts) == "\n\nGO\n\n".join(f"select {i}" for i in range(1000))
+    assert peak == 4
+    assert max_pending == 8
+    assert max_unwritten == 8
+
+@pytest.mark.asyncio
+async def test_requests_start_while_splitting(converter, monkeypatch):
+    """Test that the first chunk is requested before the rest of the file has been split"""
+    events = []
+    go_re = sql_converter._GO_RE
+    class LoggingGoRe:
+        def finditer(self, sql):
+            for match in go_re.finditer(sql):
+                events.append('split')
+                yield match
+    monkeypatch.setattr(sql_converter, '_GO_RE', LoggingGoRe())
+    async def create(**kwargs):
+        events.append('request')
+        return make_stream("select")
+    use_openai_create(converter, create)
+    converter.max_concurrency = {'openai': 2, 'claude': 2}
+    converter.max_chunk_tokens = 1
+    
+    await converter.convert_sql("\nGO\n".join(f"SELECT {i}" for i in range(20)))
+    
+    assert events.count('request') == 20
+    assert 'split' in events[events.index('request'):]
+
+@pytest.mark.asyncio
+async def test_transient_errors_are_retried(converter, monkeypatch):
+    """Test that overloaded responses are retried and client errors are not"""
+    import anthropic
+    async def no_sleep(delay):
+        pass
+    monkeypatch.setattr(asyncio, 'sleep', no_sleep)
+    
+    def status_error(code):
+        response = SimpleNamespace(status_code=code, request=None, headers={})
+        return anthropic.APIStatusError("error", response=response, body=None)
+    
+    errors = [status_error(529), status_error(500)]
+    async def create(**kwargs):
+        if errors:
+            raise errors.pop(0)
+        return make_claude_stream("select 1")
+    converter.clients['claude'] = SimpleNamespace(messages=SimpleNamespace(create=create))
+    
+    assert await converter.convert_sql("SELECT 1", provider='claude') == "select 1"
+    
+    errors[:] = [status_error(400)]
+    assert await converter.convert_sql("SELECT 2", provider='claude') is None
+
+@pytest.mark.asyncio
+async def test_identical_chunks_across_files_share_a_request(converter):
+    """Test that concurrent files converting the same chunk send it only once"""
+    calls = []
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.01)
+        return make_stream("grant all")
+    use_openai_create(converter, create)
+    converter.response_cache = None
+    
+    results = await asyncio.gather(
+        converter.convert_sql("GRANT ALL", provider='openai'),
+        converter.convert_sql("GRANT ALL", provider='openai')
+    )
+    
+    assert results == ["grant all", "grant all"]
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_caller_after_cancelled_shared_chunk_gets_a_result(converter):
+    """Test that a chunk requested right after its only caller was cancelled is converted anew"""
+    async def create(**kwargs):
+        await asyncio.sleep(0.01)
+        return make_stream("select 1")
+    use_openai_create(converter, create)
+    system_prompt = converter._load_system_prompt()
+    
+    first = asyncio.ensure_future(converter._convert_chunk('openai', "SELECT 1", system_prompt, 0))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    
+    # Requested in the next tick, before the cancelled request has finished
+    assert first.cancelled()
+    second = asyncio.ensure_future(converter._convert_chunk('openai', "SELECT 1", system_prompt, 0))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    
+    # The cancelled request finishing must not drop the new one from the shared requests
+    assert len(converter._inflight) == 1
+    assert await second == "select 1"
+
+@pytest.mark.asyncio
+async def test_race_keeps_first_successful_provider(converter):
+    """Test that racing returns the fastest successful answer and falls back on failure"""
+    async def slow_claude(**kwargs):
+        await asyncio.sleep(0.05)
+        return make_claude_stream("from claude")
+    async def fast_openai(**kwargs):
+        return make_stream("from openai")
+    async def failing_openai(**kwargs):
+        raise ValueError("boom")
+    converter.clients['claude'] = SimpleNamespace(messages=SimpleNamespace(create=slow_claude))
+    converter.response_cache = None
+    
+    use_openai_create(converter, fast_openai)
+    assert await converter.convert_sql("SELECT 1", provider='race') == "from openai"
+    
+    use_openai_create(converter, failing_openai)
+    assert await converter.convert_sql("SELECT 2", provider='race') == "from claude"
+
+@pytest.mark.asyncio
+async def test_failed_chunk_discards_output(converter):
+    """Test that a failed chunk fails the whole conversion instead of being dropped"""
+    async def create(**kwargs):
+        if 'SELECT 2' in kwargs['messages'][1]['content']:
+            raise ValueError("boom")
+        return make_stream("select 1")
+    use_openai_create(converter, create)
+    converter.max_chunk_tokens = 1
+    
+    result = await converter.convert_sql("SELECT 1\nGO\nSELECT 2", provider='openai')
+    
+    assert result is None
+
+@pytest.mark.asyncio
+async def test_empty_sql_is_not_sent(converter):
+    """Test that SQL without statements returns None without calling the API"""
+    async def create(**kwargs):
+        raise AssertionError("API should not be called")
+    use_openai_create(converter, create)
+    
+    assert await converter.convert_sql("\nGO\n", provider='openai') is None
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_for_token_budget():
+    """Test that the token bucket delays requests once it is drained"""
+    limiter = RateLimiter(tokens_per_minute=6000)
+    await limiter.acquire(6000)
+    
+    start = time.monotonic()
+    await limiter.acquire(10)
+    
+    assert time.monotonic() - start >= 0.09
+
+@pytest.mark.asyncio
+async def test_rate_limiter_disabled_by_default():
+    """Test that a limiter without limits never waits"""
+    limiter = RateLimiter()
+    start = time.monotonic()
+    for _ in range(100):
+        await limiter.acquire(10_000)
+    
+    assert time.monotonic() - start < 0.05
+
+def test_prompt_template_is_read_once(converter, tmp_path):
+    """Test that the prompt template is cached after the first read"""
+    prompt_file = tmp_path / "prompts" / "optimized_prompt.txt"
+    prompt_file.write_text("Convert {source_type} to {target_type}.")
+    
+    assert converter._load_system_prompt().startswith("Convert SYBASE to POSTGRESQL.")
+    prompt_file.unlink()
+    assert converter._load_system_prompt().startswith("Convert SYBASE to POSTGRESQL.")
+
+def test_edited_prompt_template_is_reloaded(converter, tmp_path):
+    """Test that the cached prompt is rebuilt once the template file changes"""
+    prompt_file = tmp_path / "prompts" / "optimized_prompt.txt"
+    prompt_file.write_text("Convert {source_type} to {target_type}.")
+    first = converter._load_system_prompt()
+    
+    prompt_file.write_text("Translate {source_type} into {target_type}.")
+    os.utime(prompt_file, ns=(0, prompt_file.stat().st_mtime_ns + 1_000_000_000))
+    
+    assert converter._load_system_prompt().startswith("Translate SYBASE into POSTGRESQL.")
+    assert converter._load_system_prompt() is not first
+
+def test_system_prompt_is_built_once_per_db_pair(converter, tmp_path):
+    """Test that the formatted system prompt is reused until the database types change"""
+    (tmp_path / "prompts" / "optimized_prompt.txt").write_text("Convert {source_type} to {target_type}.")
+    
+    first = converter._load_system_prompt()
+    assert converter._load_system_prompt() is first
+    converter.target_db_type = 'MYSQL'
+    assert converter._load_system_prompt().startswith("Convert SYBASE to MYSQL.")
+
+def test_missing_prompt_template_uses_built_in_default(converter, capsys):
+    """Test that without a template file the built-in prompt is used without reporting an error"""
+    assert converter._load_system_prompt().startswith("You are a SQL conversion expert. Convert the provided SQL code from SYBASE to POSTGRESQL,")
+    assert "Error" not in capsys.readouterr().out
+
+@pytest.mark.asyncio
+async def test_batch_threshold_not_reached_splits_each_file_once(converter, tmp_path, monkeypatch):
+    """Test that files split to count chunks for BATCH_API_MIN_CHUNKS are converted live from those chunks"""
+    async def create(**kwargs):
+        return make_stream("select 1")
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(ai_clients, 'get_async_openai_client', lambda: client)
+    splits = []
+    iter_sql_chunks = SQLConverter._iter_sql_chunks
+    def counting_iter_sql_chunks(self, sql_content, *args, **kwargs):
+        splits.append(sql_content)
+        return iter_sql_chunks(self, sql_content, *args, **kwargs)
+    monkeypatch.setattr(SQLConverter, '_iter_sql_chunks', counting_iter_sql_chunks)
+    (tmp_path / "source.sql").write_text("SELECT 1")
+    monkeypatch.setenv('SOURCE_DB_CODE_FILE', str(tmp_path / "source.sql"))
+    monkeypatch.setenv('BATCH_API_MIN_CHUNKS', '100')
+    
+    await sql_converter.main()
+    
+    assert splits == ["SELECT 1"]
+    assert (tmp_path / "source_POSTGRESQL_gpt-4o-mini.sql").read_text().strip() == "select 1"
+
+@pytest.mark.asyncio
+async def test_process_file_writes_target(converter, tmp_path):
+    """Test that process_file converts a file and writes the auto-named target"""
+    async def create(**kwargs):
+        return make_stream("select 1")
+    use_openai_create(converter, create)
+    source_file = tmp_path / "source.sql"
+    source_file.write_text("SELECT 1")
+    
+    await process_file(converter, str(source_file), "SELECT 1")
+    
+    target_file = tmp_path / "source_POSTGRESQL_gpt-4o-mini.sql"
+    assert target_file.read_text().strip() == "select 1"
+
+@pytest.mark.asyncio
+async def test_process_file_leaves_no_partial_target(converter, tmp_path):
+    """Test that a failed conversion writes neither the target nor a temporary file"""
+    async def create(**kwargs):
+        if 'SELECT 2' in kwargs['messages'][1]['content']:
+            raise ValueError("boom")
+        return make_stream("select 1")
+    use_openai_create(converter, create)
+    converter.max_chunk_tokens = 1
+    source_file = tmp_path / "sql_files" / "source.sql"
+    source_file.parent.mkdir()
+    
+    await process_file(converter, str(source_file), "SELECT 1\nGO\nSELECT 2")
+    
+    assert [p.name for p in source_file.parent.iterdir()] == []
+
+@pytest.mark.asyncio
+async def test_claude_batch_reassembles_files(converter):
+    """Test that Anthropic message batch results are re-grouped per file and chunk, sending repeats once"""
+    submitted = []
+    async def create(requests):
+        submitted.extend(requests)
+        return SimpleNamespace(id='batch_1', processing_status='ended')
+    async def entries():
+        for request in reversed(submitted):
+            text = request['params']['messages'][0]['content'].split('---\n')[1].lower()
+            message = SimpleNamespace(content=[SimpleNamespace(text=text)], stop_reason='end_turn')
+            yield SimpleNamespace(custom_id=request['custom_id'], result=SimpleNamespace(type='succeeded', message=message))
+    async def results(batch_id):
+        return entries()
+    converter.clients['claude'] = SimpleNamespace(messages=SimpleNamespace(
+        batches=SimpleNamespace(create=create, results=results)
+    ))
+    converter.max_chunk_tokens = 1
+    
+    converted = await converter.convert_sql_batch(
+        [("a.sql", "SELECT 1\nGO\nSELECT 2"), ("b.sql", "SELECT 3\nGO\nSELECT 1")], provider='claude'
+    )
+    
+    assert [r['custom_id'] for r in submitted] == ['0-0', '0-1', '1-0']
+    assert converted == [("a.sql", "select 1\n\nGO\n\nselect 2"), ("b.sql", "select 3\n\nGO\n\nselect 1")]
+
+@pytest.mark.asyncio
+async def test_openai_batch_reassembles_files_and_drops_truncated(converter):
+    """Test that OpenAI batch output is re-grouped per file, and a truncated answer fails its file"""
+    submitted = []
+    async def create_file(file, purpose):
+        submitted.extend(ai_clients.json_loads(line) for line in file[1].splitlines())
+        return SimpleNamespace(id='file_in')
+    async def create_batch(**kwargs):
+        return SimpleNamespace(id='batch_1', status='completed', output_file_id='file_out')
+    async def content(file_id):
+        lines = []
+        for request in submitted:
+            sql = request['body']['messages'][1]['content'].split('---\n')[1]
+            finish_reason = 'length' if sql == "SELECT 3" else 'stop'
+            body = {"choices": [{"message": {"content": sql.lower()}, "finish_reason": finish_reason}]}
+            lines.append(ai_clients.json_dumps({"custom_id": request['custom_id'], "response": {"status_code": 200, "body": body}}))
+        return SimpleNamespace(content=b"\n".join(lines))
+    converter.clients['openai'] = SimpleNamespace(
+        files=SimpleNamespace(create=create_file, content=content),
+        batches=SimpleNamespace(create=create_batch)
+    )
+    converter.max_chunk_tokens = 1
+    
+    converted = await converter.convert_sql_batch(
+        [("a.sql", "SELECT 1\nGO\nSELECT 2"), ("b.sql", "SELECT 3\nGO\nSELECT 1")], provider='openai'
+    )
+    
+    assert [r['custom_id'] for r in submitted] == ['0-0', '0-1', '1-0']
+    assert all(r['body']['max_tokens'] == 4000 for r in submitted)
+    assert converted == [("a.sql", "select 1\n\nGO\n\nselect 2"), ("b.sql", None)]
+
+@pytest.mark.asyncio
+async def test_read_and_process_file(converter, tmp_path):
+    """Test that a file is read and converted in one step, and unreadable files are skipped"""
+    async def create(**kwargs):
+        return make_stream("select 1")
+    use_openai_create(converter, create)
+    source_file = tmp_path / "source.sql"
+    source_file.write_text("SELECT 1")
+    
+    await read_and_process_file(converter, str(source_file))
+    await read_and_process_file(converter, str(tmp_path / "missing.sql"))
+    
+    assert (tmp_path / "source_POSTGRESQL_gpt-4o-mini.sql").read_text() == "select 1"
+
+def test_save_converted_chunks_writes_go_separated(converter, tmp_path):
+    """Test that converted chunks are written separated by GO"""
+    save_converted_chunks(converter, str(tmp_path / "source.sql"), ["select 1", "select 2"])
+    
+    target_file = tmp_path / "source_POSTGRESQL_gpt-4o-mini.sql"
+    assert target_file.read_text() == "select 1\n\nGO\n\nselect 2"
+
+def test_orjson_request_bodies_match_sdk_encoding():
+    """Test that orjson-encoded request bodies are byte-identical to the SDK's own encoding"""
+    pytest.importorskip('orjson')
+    from openai._utils._json import openapi_dumps
+    from pydantic import BaseModel
+    class Message(BaseModel):
+        role: str
+    module = SimpleNamespace(openapi_dumps=openapi_dumps)
+    
+    ai_clients._use_orjson_request_bodies(module)
+    
+    body = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "SELECT 'café'\nGO"}], "seed": 7}
+    assert module.openapi_dumps(body) == openapi_dumps(body)
+    assert module.openapi_dumps({"m": Message(role="user")}) == openapi_dumps({"m": Message(role="user")})
@@ -0,0 +1,513 @@
+import sys
+import json
+import asyncio
+import time
+import subprocess
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+import ai_clients
+from sql_extractor import SQLExtractor
+
+def make_extraction(proc_name, description="", tables=(), in_params=("@id",)):
+    """Build the arguments of one extract_sql_info tool call"""
+    return {
+        "proc_name": proc_name, "description": description,
+        "in_params": list(in_params), "out_params": [], "inout_params": [],
+        "related_tables": list(tables)
+    }
+
+def tool_completion(arguments):
+    """Build a minimal chat completion carrying one tool call with the given arguments"""
+    tool_call = SimpleNamespace(function=SimpleNamespace(arguments=json.dumps(arguments)))
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(tool_calls=[tool_call], content=None))])
+
+def make_completion(proc_name, description="", tables=(), in_params=("@id",)):
+    """Build a minimal chat completion carrying one extract_sql_info tool call"""
+    return tool_completion(make_extraction(proc_name, description, tables, in_params))
+
+@pytest.fixture
+def extractor(tmp_path, monkeypatch):
+    """Create a SQLExtractor with a placeholder OpenAI client, isolated in tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ai_clients, 'get_async_openai_client', lambda: SimpleNamespace())
+    return SQLExtractor()
+
+def use_create(extractor, create):
+    """Route the extractor's chat completions to a mock"""
+    extractor.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+@pytest.mark.asyncio
+async def test_procedures_are_extracted_concurrently(extractor, tmp_path):
+    """Test that independent procedures overlap and results keep file order"""
+    async def create(**kwargs):
+        await asyncio.sleep(0.2)
+        return make_completion(kwargs['messages'][1]['content'].split()[2])
+    use_create(extractor, create)
+    extractor.max_procs_per_request = 1
+    source_file = tmp_path / "procs.sql"
+    source_file.write_text("\n".join(f"CREATE PROC p{i}\nAS\nSELECT {i}\nGO" for i in range(4)))
+    
+    start = time.perf_counter()
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert time.perf_counter() - start < 0.6
+    assert [r.proc_name for r in results] == ["p0", "p1", "p2", "p3"]
+
+@pytest.mark.asyncio
+async def test_body_takes_parameters_from_header(extractor, tmp_path):
+    """Test that a split procedure's body result carries the header's parameters"""
+    async def create(**kwargs):
+        if "header section" in kwargs['messages'][0]['content']:
+            return make_completion("big")
+        return make_completion("big", "does things", ["t1"], in_params=())
+    use_create(extractor, create)
+    extractor.max_input_tokens = 14
+    source_file = tmp_path / "big.sql"
+    source_file.write_text("CREATE PROC big\n@id int\nAS\nSELECT * FROM t1 WHERE id = @id\nGO")
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert len(results) == 1
+    assert results[0].in_params == ["@id"]
+    assert results[0].related_tables == ["t1"]
+
+@pytest.mark.asyncio
+async def test_files_are_extracted_concurrently(extractor, tmp_path):
+    """Test that split procedures of concurrent files each merge with their own header"""
+    async def create(**kwargs):
+        content = kwargs['messages'][1]['content']
+        param = "@a" if "@a" in content else "@b"
+        if "header section" in kwargs['messages'][0]['content']:
+            await asyncio.sleep(0.1 if param == "@a" else 0)
+            return make_completion("big", in_params=[param])
+        return make_completion("big", "does things", ["t1"])
+    use_create(extractor, create)
+    extractor.max_input_tokens = 14
+    for name in ("a", "b"):
+        (tmp_path / f"{name}.sql").write_text(f"CREATE PROC big\n@{name} int\nAS\nSELECT * FROM t1 WHERE id = @{name}\nGO")
+    
+    results = await asyncio.gather(*(extractor.process_sql_file(str(tmp_path / f"{name}.sql")) for name in ("a", "b")))
+    
+    assert [r.in_params for file_results in results for r in file_results] == [["@a"], ["@b"]]
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_are_capped(extractor, tmp_path):
+    """Test that no more than OPENAI_MAX_CONCURRENCY extraction requests are in flight"""
+    in_flight = []
+    peak = []
+    async def create(**kwargs):
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.05)
+        in_flight.pop()
+        return make_completion(kwargs['messages'][1]['content'].split()[2])
+    use_create(extractor, create)
+    extractor.semaphore = asyncio.Semaphore(2)
+    extractor.max_procs_per_request = 1
+    source_file = tmp_path / "procs.sql"
+    source_file.write_text("\n".join(f"CREATE PROC p{i}\nAS\nSELECT {i}\nGO" for i in range(6)))
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert len(results) == 6
+    assert max(peak) == 2
+
+@pytest.mark.asyncio
+async def test_batch_merges_results_per_file(extractor, tmp_path):
+    """Test that batch results are matched back to their files by custom_id and cached"""
+    submitted = []
+    async def create_file(file, purpose):
+        submitted.extend(json.loads(line) for line in file[1].splitlines())
+        return SimpleNamespace(id='file_1')
+    async def create_batch(**kwargs):
+        return SimpleNamespace(id='batch_1', status='completed', output_file_id='file_2')
+    async def content(file_id):
+        lines = []
+        for request in reversed(submitted):
+            proc_name = request['body']['messages'][1]['content'].split()[2]
+            arguments = json.dumps(make_extraction(proc_name))
+            body = {"choices": [{"message": {"tool_calls": [{"function": {"arguments": arguments}}]}}]}
+            lines.append(json.dumps({"custom_id": request['custom_id'], "response": {"status_code": 200, "body": body}}))
+        return SimpleNamespace(content="\n".join(lines).encode())
+    extractor.client = SimpleNamespace(
+        files=SimpleNamespace(create=create_file, content=content),
+        batches=SimpleNamespace(create=create_batch)
+    )
+    extractor.max_procs_per_request = 1
+    (tmp_path / "a.sql").write_text("CREATE PROC a1\nAS\nSELECT 1\nGO\nCREATE PROC a2\nAS\nSELECT 2\nGO")
+    (tmp_path / "b.sql").write_text("CREATE PROC b1\nAS\nSELECT 3\nGO")
+    
+    results = await extractor.process_many_batch([str(tmp_path / "a.sql"), str(tmp_path / "b.sql")])
+    
+    assert [r['custom_id'] for r in submitted] == ['0-0', '0-1', '1-0']
+    assert [r.proc_name for r in results] == ["a1", "a2", "b1"]
+    
+    # A rerun, e.g. after a crash, takes every answer from the response cache
+    results = await extractor.process_many_batch([str(tmp_path / "a.sql"), str(tmp_path / "b.sql")])
+    
+    assert len(submitted) == 3
+    assert [r.proc_name for r in results] == ["a1", "a2", "b1"]
+
+@pytest.mark.asyncio
+async def test_failed_procedure_of_failed_pack_keeps_the_others(extractor, tmp_path, capsys):
+    """Test that when a pack and one of its procedures both fail, the pack's other procedures are kept"""
+    async def create(**kwargs):
+        content = kwargs['messages'][1]['content']
+        if '-- PROC_START' in content:
+            raise ValueError("malformed packed answer")
+        proc_name = content.split()[2]
+        if proc_name == "p1":
+            raise ValueError("malformed answer")
+        await asyncio.sleep(0.01)
+        return make_completion(proc_name)
+    use_create(extractor, create)
+    extractor.max_attempts = 1
+    source_file = tmp_path / "procs.sql"
+    source_file.write_text("\n".join(f"CREATE PROC p{i}\nAS\nSELECT {i}\nGO" for i in range(3)))
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert [r.proc_name for r in results] == ["p0", "p2"]
+    assert "Failed to extract p1" in capsys.readouterr().out
+
+@pytest.mark.asyncio
+async def test_batch_falls_back_for_incomplete_packs(extractor, tmp_path):
+    """Test that a packed batch answer missing procedures is extracted one procedure at a time, in place"""
+    submitted = []
+    async def create_file(file, purpose):
+        submitted.extend(json.loads(line) for line in file[1].splitlines())
+        return SimpleNamespace(id='file_1')
+    async def create_batch(**kwargs):
+        return SimpleNamespace(id='batch_1', status='completed', output_file_id='file_2')
+    async def content(file_id):
+        lines = []
+        for request in submitted:
+            content = request['body']['messages'][1]['content']
+            extraction = make_extraction(content.split()[2])
+            # Packed answers are one extraction short
+            arguments = json.dumps({"extractions": [extraction]} if "PROC_START" in content else extraction)
+            body = {"choices": [{"message": {"tool_calls": [{"function": {"arguments": arguments}}]}}]}
+            lines.append(json.dumps({"custom_id": request['custom_id'], "response": {"status_code": 200, "body": body}}))
+        return SimpleNamespace(content="\n".join(lines).encode())
+    live = []
+    async def create(**kwargs):
+        proc_name = kwargs['messages'][1]['content'].split()[2]
+        live.append(proc_name)
+        return make_completion(proc_name)
+    extractor.client = SimpleNamespace(
+        files=SimpleNamespace(create=create_file, content=content),
+        batches=SimpleNamespace(create=create_batch),
+        chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+    )
+    (tmp_path / "a.sql").write_text("CREATE PROC a1\nAS\nSELECT 1\nGO\nCREATE PROC a2\nAS\nSELECT 2\nGO")
+    (tmp_path / "b.sql").write_text("CREATE PROC b1\nAS\nSELECT 3\nGO")
+    
+    results = await extractor.process_many_batch([str(tmp_path / "a.sql"), str(tmp_path / "b.sql")])
+    
+    assert [r['custom_id'] for r in submitted] == ['0-0', '1-0']
+    assert sorted(live) == ["a1", "a2"]
+    assert [r.proc_name for r in results] == ["a1", "a2", "b1"]
+
+def test_packing_reserves_prompt_and_markers(extractor):
+    """Test that a packed request, system prompt included, stays within max_input_tokens"""
+    procs = [{'type': 'full', 'proc_name': f"p{i}", 'content': f"CREATE PROC p{i}\nAS\nSELECT {i} FROM some_table_{i}"} for i in range(20)]
+    extractor.max_input_tokens = 400
+    
+    chunks = list(extractor._pack_chunks(procs))
+    
+    assert any(chunk['type'] == 'packed' for chunk in chunks)
+    assert [c for chunk in chunks for c in chunk.get('chunks', [chunk])] == procs
+    for chunk in chunks:
+        request = extractor._request_body(chunk)
+        assert extractor._estimate_tokens(request['messages'][0]['content'] + "\n" + chunk['content']) <= 400
+
+@pytest.mark.asyncio
+async def test_small_procedures_are_packed(extractor, tmp_path):
+    """Test that small procedures share one request and fall back to single requests on a bad answer"""
+    requests = []
+    async def create(**kwargs):
+        content = kwargs['messages'][1]['content']
+        requests.append(content)
+        if '-- PROC_START' not in content:
+            return make_completion(content.split()[2])
+        names = [line.split()[2] for line in content.splitlines() if line.startswith('-- PROC_START')]
+        if 'p9' in names:
+            names = names[:1]  # One extraction short
+        return tool_completion({"extractions": [make_extraction(name) for name in names]})
+    use_create(extractor, create)
+    source_file = tmp_path / "procs.sql"
+    source_file.write_text("\n".join(f"CREATE PROC p{i}\nAS\nSELECT {i}\nGO" for i in range(3)))
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert len(requests) == 1
+    assert [r.proc_name for r in results] == ["p0", "p1", "p2"]
+    
+    requests.clear()
+    source_file.write_text("CREATE PROC p8\nAS\nSELECT 8\nGO\nCREATE PROC p9\nAS\nSELECT 9\nGO")
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert len(requests) == 3
+    assert [r.proc_name for r in results] == ["p8", "p9"]
+
+@pytest.mark.asyncio
+async def test_rate_limits_honor_retry_after(extractor, monkeypatch):
+    """Test that 429s wait for Retry-After and client errors are not retried"""
+    import openai
+    delays = []
+    async def record_sleep(delay):
+        delays.append(delay)
+    monkeypatch.setattr(asyncio, 'sleep', record_sleep)
+    
+    def status_error(cls, code, headers):
+        response = SimpleNamespace(status_code=code, request=None, headers=headers)
+        return cls("error", response=response, body=None)
+    
+    errors = [status_error(openai.RateLimitError, 429, {'retry-after': '7'})]
+    async def create(**kwargs):
+        if errors:
+            raise errors.pop(0)
+        return make_completion("p1")
+    use_create(extractor, create)
+    extractor.response_cache = None
+    chunk = {'type': 'full', 'content': "CREATE PROC p1\nAS\nSELECT 1\nGO", 'proc_name': 'p1'}
+    
+    assert (await extractor.extract_from_chunk(chunk)).proc_name == "p1"
+    assert delays == [7.0]
+    
+    errors[:] = [status_error(openai.AuthenticationError, 401, {})]
+    with pytest.raises(Exception):
+        await extractor.extract_from_chunk(chunk)
+    assert delays == [7.0]
+
+@pytest.mark.asyncio
+async def test_extractions_are_cached_across_runs(extractor, tmp_path):
+    """Test that an unchanged procedure is served from the response cache"""
+    calls = []
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return make_completion("p1", "reads t1", ["t1"])
+    use_create(extractor, create)
+    chunk = {'type': 'full', 'content': "CREATE PROC p1\nAS\nSELECT * FROM t1\nGO", 'proc_name': 'p1'}
+    
+    first = await extractor.extract_from_chunk(chunk)
+    second = await SQLExtractor().extract_from_chunk(chunk)
+    
+    assert len(calls) == 1
+    assert second == first
+
+def test_split_slices_procedures_and_headers(extractor):
+    """Test that procedures are cut at GO and oversized ones at their AS line, not at words starting with 'as'"""
+    sql = "-- setup\nCREATE PROC small\nAS\nSELECT 1\nGO\nCREATE PROC big\n  ascending int\nAS\nSELECT * FROM t1 WHERE ascending = 1\ngo"
+    extractor.max_input_tokens = 20
+    
+    chunks = extractor._split_sql_into_chunks(sql)
+    
+    assert [(c['type'], c['proc_name']) for c in chunks] == [('full', 'small'), ('header', 'big'), ('body', 'big')]
+    assert chunks[0]['content'] == "CREATE PROC small\nAS\nSELECT 1\nGO"
+    assert chunks[1]['content'] == "CREATE PROC big\n  ascending int"
+    assert chunks[2]['content'] == "AS\nSELECT * FROM t1 WHERE ascending = 1\ngo"
+
+@pytest.mark.asyncio
+async def test_requests_start_while_splitting(extractor, tmp_path):
+    """Test that a procedure is sent before the rest of the file has been split"""
+    events = []
+    split = extractor._iter_sql_chunks
+    def tracked_split(sql_content):
+        for chunk in split(sql_content):
+            events.append(('split', chunk['proc_name']))
+            yield chunk
+    async def create(**kwargs):
+        proc_name = kwargs['messages'][1]['content'].split()[2]
+        events.append(('request', proc_name))
+        return make_completion(proc_name)
+    use_create(extractor, create)
+    extractor._iter_sql_chunks = tracked_split
+    extractor.max_procs_per_request = 1
+    source_file = tmp_path / "procs.sql"
+    source_file.write_text("\n".join(f"CREATE PROC p{i}\nAS\nSELECT {i}\nGO" for i in range(6)))
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert [r.proc_name for r in results] == [f"p{i}" for i in range(6)]
+    assert events.index(('request', 'p0')) < events.index(('split', 'p5'))
+
+@pytest.mark.asyncio
+async def test_repeated_procedures_share_a_request(extractor, tmp_path):
+    """Test that identical procedures in flight together are sent only once"""
+    calls = []
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.01)
+        return make_completion("p1")
+    use_create(extractor, create)
+    extractor.response_cache = None
+    extractor.max_procs_per_request = 1
+    source_file = tmp_path / "procs.sql"
+    source_file.write_text("CREATE PROC p1\nAS\nSELECT 1\nGO\nCREATE PROC p1\nAS\nSELECT 1\nGO")
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert len(calls) == 1
+    assert [r.proc_name for r in results] == ["p1", "p1"]
+    assert results[0] is not results[1]
+
+@pytest.mark.asyncio
+async def test_multi_part_body_is_merged_into_one_result(extractor, tmp_path):
+    """Test that a body split into parts yields one result with the header parameters and all tables"""
+    async def create(**kwargs):
+        content = kwargs['messages'][1]['content']
+        if "header section" in kwargs['messages'][0]['content']:
+            return make_completion("big")
+        tables = [line.split()[-1] for line in content.splitlines() if "FROM" in line]
+        return make_completion("big", f"reads {', '.join(tables)}", tables)
+    use_create(extractor, create)
+    extractor.max_input_tokens = 8
+    source_file = tmp_path / "big.sql"
+    source_file.write_text("CREATE PROC big\n@id int\nAS\nSELECT * FROM t2\nSELECT * FROM t1\nSELECT * FROM t2\nGO")
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert len(results) == 1
+    assert results[0].in_params == ["@id"]
+    assert results[0].related_tables == ["t1", "t2"]
+    assert results[0].description == "reads t2\nreads t1\nreads t2"
+
+@pytest.mark.asyncio
+async def test_body_parts_are_requested_concurrently(extractor, tmp_path):
+    """Test that the parts of a split body are in flight together and still merged in order"""
+    in_flight = []
+    peak = []
+    async def create(**kwargs):
+        content = kwargs['messages'][1]['content']
+        if "header section" in kwargs['messages'][0]['content']:
+            return make_completion("big")
+        tables = [line.split()[-1] for line in content.splitlines() if "FROM" in line]
+        in_flight.append(1)
+        peak.append(len(in_flight))
+        # Earlier parts answer last
+        await asyncio.sleep(0.05 * (3 - int(tables[0][1:])))
+        in_flight.pop()
+        return make_completion("big", f"reads {', '.join(tables)}", tables)
+    use_create(extractor, create)
+    extractor.max_input_tokens = 8
+    source_file = tmp_path / "big.sql"
+    source_file.write_text("CREATE PROC big\n@id int\nAS\nSELECT * FROM t1\nSELECT * FROM t2\nSELECT * FROM t3\nGO")
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert max(peak) == 3
+    assert results[0].description == "reads t1\nreads t2\nreads t3"
+    assert results[0].in_params == ["@id"]
+
+@pytest.mark.asyncio
+async def test_failed_procedure_keeps_other_results(extractor, tmp_path, capsys):
+    """Test that a procedure that cannot be extracted is reported without discarding the rest of the file"""
+    async def create(**kwargs):
+        proc_name = kwargs['messages'][1]['content'].split()[2]
+        if proc_name == "p1":
+            raise ValueError("malformed answer")
+        return make_completion(proc_name)
+    use_create(extractor, create)
+    extractor.max_attempts = 1
+    extractor.max_procs_per_request = 1
+    source_file = tmp_path / "procs.sql"
+    source_file.write_text("\n".join(f"CREATE PROC p{i}\nAS\nSELECT {i}\nGO" for i in range(3)))
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert [r.proc_name for r in results] == ["p0", "p2"]
+    assert "Failed to extract p1" in capsys.readouterr().out
+
+@pytest.mark.asyncio
+async def test_split_failure_cancels_sent_procedures(extractor, tmp_path, monkeypatch):
+    """Test that procedures already sent are cancelled when the rest of the file cannot be split"""
+    cancelled = []
+    async def create(**kwargs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+    use_create(extractor, create)
+    def split(sql_content):
+        yield {'type': 'full', 'proc_name': 'p0', 'content': sql_content}
+        raise ValueError("cannot split")
+    monkeypatch.setattr(extractor, '_iter_sql_chunks', split)
+    extractor.max_procs_per_request = 1
+    source_file = tmp_path / "procs.sql"
+    source_file.write_text("CREATE PROC p0\nAS\nSELECT 0\nGO")
+    
+    assert await extractor.process_sql_file(str(source_file)) == []
+    assert cancelled == [1]
+
+@pytest.mark.asyncio
+async def test_request_after_cancelled_shared_request_gets_a_result(extractor):
+    """Test that a chunk requested right after its only caller was cancelled is sent anew"""
+    async def create(**kwargs):
+        await asyncio.sleep(0.01)
+        return make_completion("p1")
+    use_create(extractor, create)
+    chunk = {'type': 'full', 'proc_name': 'p1', 'content': "CREATE PROC p1\nAS\nSELECT 1"}
+    
+    first = asyncio.ensure_future(extractor._fetch_arguments(chunk, 0))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(extractor._fetch_arguments(chunk, 0))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    
+    assert first.cancelled()
+    assert len(extractor._inflight) == 1
+    assert json.loads(await second)["proc_name"] == "p1"
+
+def test_extractor_uses_shared_client(extractor, monkeypatch):
+    """Test that extraction goes through the process-wide client and its connection pool"""
+    shared = SimpleNamespace()
+    monkeypatch.setattr(ai_clients, 'get_async_openai_client', lambda: shared)
+    
+    assert SQLExtractor().client is shared
+
+def test_system_prompts_share_a_stable_prefix(extractor):
+    """Test that every chunk type's system prompt starts with the same text and ends with its variable parts"""
+    chunks = [
+        {'type': 'header', 'proc_name': 'p1', 'content': ''},
+        {'type': 'body', 'proc_name': 'p1', 'content': '', 'chunk_index': 1, 'total_chunks': 3},
+        {'type': 'packed', 'proc_name': 'p1, p2', 'content': '', 'chunks': [{}, {}]},
+        {'type': 'full', 'proc_name': 'p2', 'content': ''}
+    ]
+    prompts = [extractor._request_body(chunk)['messages'][0]['content'] for chunk in chunks]
+    
+    prefix = prompts[0].split("\n\n")[0]
+    assert all(prompt.startswith(prefix + "\n\n") for prompt in prompts)
+    assert prompts[1].endswith("procedure p1 (Part 2 of 3).")
+    assert prompts[2].endswith("The input contains 2 procedures.")
+
+@pytest.mark.asyncio
+async def test_body_finds_header_by_split_name(extractor, tmp_path):
+    """Test that a body merges with its header even if the model spells the name differently"""
+    async def create(**kwargs):
+        if "header section" in kwargs['messages'][0]['content']:
+            return make_completion("dbo.BIG")
+        return make_completion("big", "does things", ["t1"], in_params=())
+    use_create(extractor, create)
+    extractor.max_input_tokens = 14
+    source_file = tmp_path / "big.sql"
+    source_file.write_text("CREATE PROC big\n@id int\nAS\nSELECT * FROM t1 WHERE id = @id\nGO")
+    
+    results = await extractor.process_sql_file(str(source_file))
+    
+    assert [r.in_params for r in results] == [["@id"]]
+
+def test_modules_import_without_provider_sdks():
+    """Test that importing the converter and extractor does not load the provider SDKs"""
+    check = "import sys, sql_converter, sql_extractor; print(sorted({'openai', 'anthropic'} & set(sys.modules)))"
+    result = subprocess.run(
+        [sys.executable, "-c", check], cwd=Path(__file__).parent.parent, capture_output=True, text=True, check=True
+    )
+    
+    assert result.stdout.strip() == "[]"
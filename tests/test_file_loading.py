@@ -2,9 +2,11 @@ import os
 import pytest
 from sql_converter import SQLConverter
 
-@pytest.fixture
-def setup_test_files(tmp_path):
-    """Create temporary SQL files for testing"""
+@pytest.fixture(scope="module")
+def setup_test_files(tmp_path_factory):
+    """Create temporary SQL files for testing, once for the module since tests only read them"""
+    tmp_path = tmp_path_factory.mktemp("sql_files")
+    
     # Create test files
     file1 = tmp_path / "test1.sql"
     file2 = tmp_path / "test2.sql"
@@ -64,12 +66,41 @@ def test_multiple_patterns_loading(setup_test_files):
     assert any("table1" in content for _, content in files)
     assert any("table3" in content for _, content in files)
 
-def test_nonexistent_file_error():
+def test_directory_in_file_list_loading(setup_test_files):
+    """Test that directories and ? wildcards work inside a semicolon list, ignoring empty entries"""
+    file_path = f"{setup_test_files}/test?.sql;{setup_test_files}/subdir;"
+    files = SQLConverter.load_sql_files(file_path)
+    
+    assert len(files) == 3
+    assert any("table3" in content for _, content in files)
+
+def test_nonexistent_file_error(tmp_path):
     """Test error handling for nonexistent files"""
     with pytest.raises(FileNotFoundError):
-        SQLConverter.load_sql_files("nonexistent.sql")
+        SQLConverter.load_sql_files(str(tmp_path / "nonexistent.sql"))
 
 def test_empty_directory_loading(tmp_path):
     """Test loading from an empty directory"""
     files = SQLConverter.load_sql_files(str(tmp_path))
     assert len(files) == 0
+
+@pytest.mark.asyncio
+async def test_async_loading_matches_sync(setup_test_files):
+    """Test that async loading returns the same files as sync loading"""
+    files = await SQLConverter.load_sql_files_async(str(setup_test_files))
+    
+    assert sorted(files) == sorted(SQLConverter.load_sql_files(str(setup_test_files)))
+    assert len(files) == 3
+
+@pytest.mark.asyncio
+async def test_async_nonexistent_file_error(tmp_path):
+    """Test error handling for nonexistent files in async loading"""
+    with pytest.raises(FileNotFoundError):
+        await SQLConverter.load_sql_files_async(str(tmp_path / "nonexistent.sql"))
+
+def test_validate_db_type():
+    """Test that supported database types are accepted in any case and others rejected"""
+    assert SQLConverter._validate_db_type("POSTGRESQL") == "POSTGRESQL"
+    assert SQLConverter._validate_db_type("sybase") == "sybase"
+    with pytest.raises(ValueError):
+        SQLConverter._validate_db_type("FOXPRO")
@@ -0,0 +1,70 @@
+import os
+from response_cache import ResponseCache, SemanticCache
+
+def test_cache_roundtrip(tmp_path):
+    """Test storing and reading back a cached response"""
+    cache = ResponseCache(str(tmp_path))
+    key = ResponseCache.make_key('openai', 'gpt-4o-mini', 'prompt', 'SELECT 1')
+    
+    assert cache.get(key) is None
+    cache.set(key, "SELECT 1;")
+    assert cache.get(key) == "SELECT 1;"
+
+def test_cache_key_covers_all_parts():
+    """Test that every part of the request changes the cache key"""
+    base = ResponseCache.make_key('openai', 'gpt-4o-mini', 'prompt', 'SELECT 1')
+    
+    assert base == ResponseCache.make_key('openai', 'gpt-4o-mini', 'prompt', 'SELECT 1')
+    assert base != ResponseCache.make_key('claude', 'gpt-4o-mini', 'prompt', 'SELECT 1')
+    assert base != ResponseCache.make_key('openai', 'gpt-4o', 'prompt', 'SELECT 1')
+    assert base != ResponseCache.make_key('openai', 'gpt-4o-mini', 'other', 'SELECT 1')
+    assert base != ResponseCache.make_key('openai', 'gpt-4o-mini', 'prompt', 'SELECT 2')
+
+def test_cache_leaves_no_temp_files(tmp_path):
+    """Test that atomic writes do not leave temporary files behind"""
+    cache = ResponseCache(str(tmp_path))
+    cache.set('abc', "first")
+    cache.set('abc', "second")
+    
+    assert cache.get('abc') == "second"
+    assert os.listdir(tmp_path) == ['abc.txt']
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that a bounded cache evicts the entries read or written longest ago"""
+    cache = ResponseCache(str(tmp_path), max_entries=3)
+    for i, key in enumerate(['a', 'b', 'c']):
+        cache.set(key, key)
+        os.utime(tmp_path / f"{key}.txt", (i, i))
+    cache.get('a')
+    cache.set('d', "d")
+    
+    assert sorted(os.listdir(tmp_path)) == ['a.txt', 'd.txt']
+
+def test_semantic_cache_lookup(tmp_path):
+    """Test similarity matching, length tolerance and namespaces"""
+    cache = SemanticCache(str(tmp_path / "semcache.sqlite"), threshold=0.97)
+    cache.add('ns', [1.0, 0.0, 0.0], 100, "converted")
+    
+    assert cache.lookup('ns', [0.99, 0.01, 0.0], 102) == "converted"
+    assert cache.lookup('ns', [0.0, 1.0, 0.0], 100) is None
+    assert cache.lookup('ns', [1.0, 0.0, 0.0], 120) is None
+    assert cache.lookup('other', [1.0, 0.0, 0.0], 100) is None
+
+def test_semantic_cache_persists(tmp_path):
+    """Test that entries survive reopening the cache"""
+    path = str(tmp_path / "semcache.sqlite")
+    cache = SemanticCache(path, threshold=0.97)
+    cache.add('ns', [0.0, 2.0], 10, "converted")
+    cache.flush()
+    
+    assert SemanticCache(path, threshold=0.97).lookup('ns', [0.0, 1.0], 10) == "converted"
+
+def test_semantic_cache_commits_in_batches(tmp_path):
+    """Test that entries are committed every commit_every additions instead of one by one"""
+    path = str(tmp_path / "semcache.sqlite")
+    cache = SemanticCache(path, threshold=0.97, commit_every=2)
+    
+    cache.add('ns', [1.0, 0.0], 10, "first")
+    assert SemanticCache(path, threshold=0.97).lookup('ns', [1.0, 0.0], 10) is None
+    cache.add('ns', [0.0, 1.0], 10, "second")
+    assert SemanticCache(path, threshold=0.97).lookup('ns', [1.0, 0.0], 10) == "first"
@@ -0,0 +1,144 @@
+import time
+
+import pytest
+
+import ai_clients
+from sql_converter import _GO_RE
+
+@pytest.fixture
+def converter(shared_converter):
+    """Splitting does not change the converter, so every test shares one"""
+    return shared_converter
+
+def test_split_on_go_statements(converter):
+    """Test splitting SQL on GO batch separators in any case"""
+    sql = "SELECT 1;\nGO\nSELECT 2;\n  go  \nSELECT 3;\nGo\n"
+    chunks = converter._split_sql_into_chunks(sql, max_tokens=1)
+    
+    assert chunks == ["SELECT 1;", "SELECT 2;", "SELECT 3;"]
+    
+    # Mixed case and runs of tabs and spaces around GO
+    sql = "SELECT 1;\n\t gO \t\nSELECT 2;\n\t\tGO\t \t\nSELECT 3;"
+    assert converter._split_sql_into_chunks(sql, max_tokens=1) == ["SELECT 1;", "SELECT 2;", "SELECT 3;"]
+
+def test_go_inside_identifier_is_not_a_separator(converter):
+    """Test that GO only separates batches when alone on a line"""
+    sql = "SELECT goal FROM games\nGO\nSELECT 1 AS go_value"
+    chunks = converter._split_sql_into_chunks(sql, max_tokens=1)
+    
+    assert chunks == ["SELECT goal FROM games", "SELECT 1 AS go_value"]
+
+def test_indentation_is_preserved(converter):
+    """Test that chunk content keeps its original formatting"""
+    sql = "CREATE PROC p AS\nBEGIN\n    SELECT 1\nEND\nGO"
+    chunks = converter._split_sql_into_chunks(sql)
+    
+    assert chunks == ["CREATE PROC p AS\nBEGIN\n    SELECT 1\nEND"]
+
+def test_oversized_batch_splits_at_procedures(converter):
+    """Test that batches over the token budget are cut at CREATE PROC boundaries"""
+    proc1 = "CREATE PROC p1 AS\nSELECT 1 FROM t1"
+    proc2 = "create procedure p2 AS\nSELECT 2 FROM t2"
+    chunks = converter._split_sql_into_chunks(f"{proc1}\n{proc2}", max_tokens=15)
+    
+    assert chunks == [proc1, proc2]
+
+def test_oversized_batch_falls_back_to_lines(converter):
+    """Test that batches without procedure boundaries are cut at line boundaries"""
+    sql = "\n".join(f"INSERT INTO t VALUES ({i});" for i in range(10))
+    chunks = converter._split_sql_into_chunks(sql, max_tokens=20)
+    
+    assert len(chunks) > 1
+    assert all(ai_clients.count_tokens(chunk, 'gpt-4o-mini') <= 20 for chunk in chunks)
+    assert "\n".join(chunks) == sql
+
+def test_oversized_batch_prefers_blank_lines(converter):
+    """Test that batches without procedure boundaries are cut at blank lines before single lines"""
+    first = "INSERT INTO t VALUES (1);\nINSERT INTO t VALUES (2);"
+    second = "INSERT INTO t VALUES (3);\nINSERT INTO t VALUES (4);"
+    chunks = converter._split_sql_into_chunks(f"{first}\n\n{second}", max_tokens=20)
+    
+    assert chunks == [first, second]
+
+def test_split_on_go_with_crlf(converter):
+    """Test that GO lines ending in CRLF still separate batches"""
+    chunks = converter._split_sql_into_chunks("SELECT 1;\r\nGO\r\nSELECT 2;\r\n", max_tokens=1)
+    
+    assert chunks == ["SELECT 1;", "SELECT 2;"]
+
+def test_small_batches_are_packed(converter):
+    """Test that consecutive small batches share one chunk within the token budget"""
+    sql = "SET NOCOUNT ON\nGO\nGRANT SELECT ON t TO u\nGO\nSELECT 1"
+    chunks = converter._split_sql_into_chunks(sql)
+    
+    assert chunks == ["SET NOCOUNT ON\nGO\nGRANT SELECT ON t TO u\nGO\nSELECT 1"]
+
+def test_packing_respects_token_budget(converter):
+    """Test that packing starts a new chunk once the token budget is reached"""
+    sql = "\nGO\n".join(f"INSERT INTO t VALUES ({i});" for i in range(6))
+    chunks = converter._split_sql_into_chunks(sql, max_tokens=20)
+    
+    assert len(chunks) > 1
+    assert "\nGO\n".join(chunks) == sql
+
+def test_packing_counts_go_separators(converter):
+    """Test that the GO separators added by packing count against the token budget"""
+    sql = "\nGO\n".join(f"INSERT INTO t VALUES ({i});" for i in range(6))
+    chunks = converter._split_sql_into_chunks(sql, max_tokens=16)
+    
+    assert all(ai_clients.count_tokens(chunk, 'gpt-4o-mini') <= 16 for chunk in chunks)
+    assert "\nGO\n".join(chunks) == sql
+
+def test_split_batch_is_not_packed(converter):
+    """Test that pieces of an oversized batch are never re-joined with GO"""
+    sql = "SELECT 1\nGO\n" + "\n".join(f"INSERT INTO t VALUES ({i});" for i in range(10))
+    chunks = converter._split_sql_into_chunks(sql, max_tokens=20)
+    
+    assert chunks[0] == "SELECT 1"
+    assert all("GO" not in chunk for chunk in chunks[1:])
+
+def test_empty_content(converter):
+    """Test that empty input produces no chunks"""
+    assert converter._split_sql_into_chunks("") == []
+    assert converter._split_sql_into_chunks("GO\n\nGO\n") == []
+
+def test_large_file_with_many_separators(converter):
+    """Test that a ~1 MB file with thousands of GO separators splits quickly and loses nothing"""
+    batches = [f"INSERT INTO t VALUES ({i}, 'some padding text here');" for i in range(20000)]
+    sql = "\nGO\n".join(batches)
+    
+    start = time.perf_counter()
+    chunks = converter._split_sql_into_chunks(sql)
+    
+    assert time.perf_counter() - start < 5
+    assert "\nGO\n".join(chunks) == sql
+
+def test_go_inside_strings_and_comments_is_not_a_separator(converter):
+    """Test that GO lines inside string literals and comments do not split a batch"""
+    literal = "INSERT INTO t VALUES ('line one\nGO\nline two')"
+    comment = "/* disabled:\ngo\n*/ SELECT 1"
+    quoted = "SELECT \"a\ngo\nb\", 'it''s' -- don't\nGO\nSELECT 2"
+    
+    assert converter._split_sql_into_chunks(literal, max_tokens=1000) == [literal]
+    assert converter._split_sql_into_chunks(comment, max_tokens=1000) == [comment]
+    separators = [m.group() for m in _GO_RE.finditer(quoted) if m.lastgroup == 'go']
+    assert separators == ["GO"]
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT 1\nGO\nSELECT 2", 1),
+    ("SELECT 1\ngo\nSELECT 2\nGo\nSELECT 3", 2),
+    ("GO", 1),
+    ("SELECT 1\n\t go \t\nSELECT 2", 1),
+    ("SELECT 1\r\nGO\r\nSELECT 2", 1),
+    ("SELECT 'go' FROM t", 0),
+    ("SELECT goal FROM t\nGOTO done\nGO;", 0),
+    ("SELECT 'a\nGO\nb'", 0),
+    ("SELECT \"a\nGO\nb\"", 0),
+    ("SELECT 'it''s'\nGO\nSELECT 1", 1),
+    ("/* a\nGO\n*/\nGO", 1),
+    ("-- GO\nGO", 1),
+    ("SELECT 'unterminated\nGO\nSELECT 2", 1),
+])
+def test_go_separator_grammar(sql, expected):
+    """Test which GO lines the tokenizer reports as batch separators"""
+    assert sum(m.lastgroup == 'go' for m in _GO_RE.finditer(sql)) == expected